@@ -1,30 +1,65 @@
 # ai.py — streaming Ollama client for fast first audio
 from __future__ import annotations
-import requests
-from typing import Iterator, Optional
-from config import OLLAMA_BASE_URL, OLLAMA_MODEL
+import json
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional
+from config import (
+    OLLAMA_BASE_URL, OLLAMA_MODEL, OLLAMA_FAST_MODEL,
+    AI_FIRST_TOKEN_BUDGET, AI_CANNED_REPLY,
+)
 
-def ask_ai(prompt: str, system: Optional[str] = None, max_tokens: int = 160) -> str:
-    """Non-streaming (kept for compatibility)."""
-    url = f"{OLLAMA_BASE_URL}/api/chat"
+if TYPE_CHECKING:
+    import requests
+
+KEEP_ALIVE = "10m"   # keep models loaded in Ollama between turns
+
+# One HTTP session per model so connections stay open (warm pool)
+_SESSIONS: Dict[str, requests.Session] = {}
+_SESSIONS_LOCK = threading.Lock()
+
+
+def _session(model: str) -> requests.Session:
+    import requests  # imported on first use to keep startup fast
+    with _SESSIONS_LOCK:
+        s = _SESSIONS.get(model)
+        if s is None:
+            s = _SESSIONS[model] = requests.Session()
+        return s
+
+
+def _messages(prompt: str, system: Optional[str]) -> List[dict]:
     msgs = []
     if system:
         msgs.append({"role": "system", "content": system})
     msgs.append({"role": "user", "content": prompt})
-    r = requests.post(
-        url,
-        json={
-            "model": OLLAMA_MODEL,
-            "messages": msgs,
-            "stream": False,
-            "options": {
-                "temperature": 0.6,
-                "num_predict": max_tokens,   # cap length
-                "num_ctx": 2048,            # enough context but not huge
-                "num_thread": 0,            # let Ollama pick CPU threads
-                "keep_alive": "10m",        # keep model warm
-            },
+    return msgs
+
+
+def _payload(model: str, msgs: List[dict], max_tokens: int, stream: bool) -> dict:
+    return {
+        "model": model,
+        "messages": msgs,
+        "stream": stream,
+        "keep_alive": KEEP_ALIVE,       # keep model warm
+        "options": {
+            "temperature": 0.6,
+            "num_predict": max_tokens,   # cap length
+            "num_ctx": 2048,            # enough context but not huge
+            "num_thread": 0,            # let Ollama pick CPU threads
         },
+    }
+
+
+def ask_ai(prompt: str, system: Optional[str] = None, max_tokens: int = 160,
+           model: str = OLLAMA_MODEL) -> str:
+    """Non-streaming (kept for compatibility)."""
+    url = f"{OLLAMA_BASE_URL}/api/chat"
+    r = _session(model).post(
+        url,
+        json=_payload(model, _messages(prompt, system), max_tokens, stream=False),
         timeout=120,
     )
     if r.status_code != 200:
@@ -32,32 +67,23 @@ def ask_ai(prompt: str, system: Optional[str] = None, max_tokens: int = 160) ->
     data = r.json()
     return data.get("message", {}).get("content", "").strip()
 
-def ask_ai_stream(prompt: str, system: Optional[str] = None, max_tokens: int = 160) -> Iterator[str]:
+
+def ask_ai_stream(prompt: str, system: Optional[str] = None, max_tokens: int = 160,
+                  model: str = OLLAMA_MODEL,
+                  on_response: Optional[Callable[["requests.Response"], None]] = None) -> Iterator[str]:
     """
     Streaming generator. Yields small text chunks so the caller can speak them immediately.
+    on_response gets the open response, so another thread can close it to abort generation.
     """
     url = f"{OLLAMA_BASE_URL}/api/chat"
-    msgs = []
-    if system:
-        msgs.append({"role": "system", "content": system})
-    msgs.append({"role": "user", "content": prompt})
-    with requests.post(
+    with _session(model).post(
         url,
-        json={
-            "model": OLLAMA_MODEL,
-            "messages": msgs,
-            "stream": True,
-            "options": {
-                "temperature": 0.6,
-                "num_predict": max_tokens,
-                "num_ctx": 2048,
-                "num_thread": 0,
-                "keep_alive": "10m",
-            },
-        },
+        json=_payload(model, _messages(prompt, system), max_tokens, stream=True),
         stream=True,
         timeout=120,
     ) as r:
+        if on_response:
+            on_response(r)
         if r.status_code != 200:
             yield f"[AI error {r.status_code}] {r.text[:200]}"
             return
@@ -66,7 +92,6 @@ def ask_ai_stream(prompt: str, system: Optional[str] = None, max_tokens: int = 1
                 continue
             # each line is a JSON object like {"message":{"role":"assistant","content":"token"},"done":false}
             try:
-                import json
                 obj = json.loads(line)
                 if "message" in obj and "content" in obj["message"]:
                     yield obj["message"]["content"]
@@ -75,3 +100,195 @@ def ask_ai_stream(prompt: str, system: Optional[str] = None, max_tokens: int = 1
             except Exception:
                 # ignore parse glitches
                 continue
+
+
+# ------------------------ Model routing ------------------------
+# Short chit-chat goes to the fast model; longer / "explain" style prompts go to
+# OLLAMA_MODEL unless its observed first-token latency is over budget.
+HARD_HINTS = ("why", "explain", "how does", "how do", "compare", "difference",
+              "write", "summar", "story", "code", "step by step")
+HARD_MIN_WORDS = 12
+EWMA_ALPHA = 0.3
+PROBE_AFTER_S = 120.0   # retry an over-budget OLLAMA_MODEL this long after its last sample
+
+
+@dataclass
+class ModelStats:
+    calls: int = 0
+    timeouts: int = 0
+    errors: int = 0
+    first_token_s: Optional[float] = None   # EWMA
+    total_s: Optional[float] = None         # EWMA, request → stream end or caller stopped reading
+    sampled_at: float = 0.0                 # time.monotonic() of the last first-token sample
+
+
+_STATS: Dict[str, ModelStats] = {}
+_STATS_LOCK = threading.Lock()
+
+
+def _ewma(old: Optional[float], new: float) -> float:
+    return new if old is None else (1 - EWMA_ALPHA) * old + EWMA_ALPHA * new
+
+
+def _record(model: str, first_token: Optional[float] = None, total: Optional[float] = None,
+            timed_out: bool = False, error: bool = False) -> None:
+    with _STATS_LOCK:
+        st = _STATS.setdefault(model, ModelStats())
+        if total is None:
+            st.calls += 1   # a finished stream was already counted at its first token
+        if timed_out:
+            st.timeouts += 1
+            # count a timeout as a slow sample so routing backs off this model
+            st.first_token_s = _ewma(st.first_token_s, 2 * AI_FIRST_TOKEN_BUDGET)
+            st.sampled_at = time.monotonic()
+        if error:
+            st.errors += 1
+        if first_token is not None:
+            st.first_token_s = _ewma(st.first_token_s, first_token)
+            st.sampled_at = time.monotonic()
+        if total is not None:
+            st.total_s = _ewma(st.total_s, total)
+
+
+def model_stats() -> Dict[str, ModelStats]:
+    """Snapshot of per-model latency stats."""
+    with _STATS_LOCK:
+        return {m: ModelStats(**vars(s)) for m, s in _STATS.items()}
+
+
+def is_hard_prompt(prompt: str) -> bool:
+    p = (prompt or "").lower()
+    return len(p.split()) >= HARD_MIN_WORDS or any(h in p for h in HARD_HINTS)
+
+
+def choose_model(prompt: str, budget: float = AI_FIRST_TOKEN_BUDGET) -> str:
+    """
+    Pick the model for this prompt given a first-token latency budget (seconds).
+    An over-budget OLLAMA_MODEL gets one probe every PROBE_AFTER_S (the fast
+    model still backs it up), so a single cold-start timeout doesn't rule it out
+    for the rest of the process.
+    """
+    if OLLAMA_MODEL == OLLAMA_FAST_MODEL or not is_hard_prompt(prompt):
+        return OLLAMA_FAST_MODEL
+    with _STATS_LOCK:
+        st = _STATS.get(OLLAMA_MODEL)
+        if st is None or st.first_token_s is None or st.first_token_s <= budget:
+            return OLLAMA_MODEL
+        now = time.monotonic()
+        if now - st.sampled_at < PROBE_AFTER_S:
+            return OLLAMA_FAST_MODEL
+        st.sampled_at = now   # one probe per interval, even with concurrent sessions
+    return OLLAMA_MODEL
+
+
+def warm_models(models: Optional[List[str]] = None) -> threading.Thread:
+    """Load models into Ollama in the background so the first question isn't cold."""
+    targets = models or list(dict.fromkeys([OLLAMA_FAST_MODEL, OLLAMA_MODEL]))
+
+    def _run():
+        for m in targets:
+            t0 = time.perf_counter()
+            try:
+                # an empty prompt just loads the model and keeps it resident
+                _session(m).post(f"{OLLAMA_BASE_URL}/api/generate",
+                                 json={"model": m, "keep_alive": KEEP_ALIVE}, timeout=120)
+                print(f"[ai] warmed {m} in {time.perf_counter() - t0:.1f}s")
+            except Exception as e:
+                print(f"[ai] warm-up failed for {m}: {e!r}")
+
+    t = threading.Thread(target=_run, name="ai-warmup", daemon=True)
+    t.start()
+    return t
+
+
+_DONE = object()
+
+
+class _Cancel:
+    """Cancels one streaming request: sets the flag and closes its HTTP response."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._resp: Optional["requests.Response"] = None
+        self._lock = threading.Lock()
+
+    def is_set(self) -> bool:
+        return self._event.is_set()
+
+    def attach(self, resp: "requests.Response") -> None:
+        with self._lock:
+            self._resp = resp
+            if self._event.is_set():
+                resp.close()
+
+    def set(self) -> None:
+        with self._lock:
+            self._event.set()
+            if self._resp is not None:
+                # dropping the connection makes Ollama stop generating; close() can
+                # block while the pump thread is mid-read, so don't make the caller wait
+                threading.Thread(target=self._resp.close, name="ai-cancel", daemon=True).start()
+
+
+def _pump(model: str, prompt: str, system: Optional[str], max_tokens: int,
+          out: "queue.Queue", cancel: _Cancel) -> None:
+    try:
+        for tok in ask_ai_stream(prompt, system=system, max_tokens=max_tokens, model=model,
+                                 on_response=cancel.attach):
+            if cancel.is_set():
+                break
+            if tok.startswith("[AI error"):
+                raise RuntimeError(tok)
+            out.put(tok)
+    except Exception as e:
+        if not cancel.is_set():   # reads fail once the response is closed under us
+            out.put(e)
+    finally:
+        out.put(_DONE)
+
+
+def ask_ai_routed(prompt: str, system: Optional[str] = None, max_tokens: int = 160,
+                  budget: float = AI_FIRST_TOKEN_BUDGET) -> Iterator[str]:
+    """
+    Like ask_ai_stream, but routes between OLLAMA_FAST_MODEL and OLLAMA_MODEL.
+    If no token arrives within `budget` seconds, falls back to the fast model,
+    then to AI_CANNED_REPLY.
+    """
+    first = choose_model(prompt, budget)
+    chain = list(dict.fromkeys([first, OLLAMA_FAST_MODEL]))
+
+    for model in chain:
+        out: "queue.Queue" = queue.Queue()
+        cancel = _Cancel()
+        t0 = time.perf_counter()
+        threading.Thread(target=_pump, args=(model, prompt, system, max_tokens, out, cancel),
+                         name=f"ai-{model}", daemon=True).start()
+        try:
+            item = out.get(timeout=budget)
+        except queue.Empty:
+            cancel.set()
+            _record(model, timed_out=True)
+            print(f"[ai] {model} missed {budget:.1f}s first-token budget")
+            continue
+        if item is _DONE or isinstance(item, Exception):
+            cancel.set()
+            _record(model, error=True)
+            print(f"[ai] {model} failed: {item!r}")
+            continue
+
+        _record(model, first_token=time.perf_counter() - t0)
+        try:
+            yield item
+            while True:
+                item = out.get()
+                if item is _DONE or isinstance(item, Exception):
+                    break
+                yield item
+        finally:
+            # caller may stop early (e.g. after the first sentence): record how long
+            # the turn used the model either way
+            cancel.set()
+            _record(model, total=time.perf_counter() - t0)
+        return
+
+    yield AI_CANNED_REPLY
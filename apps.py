@@ -0,0 +1,336 @@
+# apps.py — indexed application launcher
+#
+# Scans Linux .desktop entries, Windows Start Menu shortcuts and macOS .app
+# bundles (plus APP_PATHS overrides) in the background, caches the result on
+# disk and only rescans directories whose mtime changed. Lookups are dict hits
+# plus a trigram fallback for fuzzy names, so "launch vee ess code" or
+# "open text editor" resolve without editing source. Bare PATH executables and
+# Terminal=true entries are never indexed: voice input must not reach
+# `shutdown` or `yes`, or start a console program with no terminal.
+from __future__ import annotations
+import json
+import os
+import re
+import shlex
+import subprocess
+import sys
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import INDEX_DIR
+
+CACHE_FILE = os.path.join(INDEX_DIR, "apps.json")
+CACHE_VERSION = 2
+FUZZY_MIN = 0.6            # Dice similarity on trigrams
+
+# Explicit overrides win over scanned entries with the same key
+_PRIORITY = {"override": 0, "desktop": 1, "lnk": 1, "app": 1}
+
+# Spoken letter names → letters ("vee ess code" → "vs code"). Only applied to
+# runs of two or more, and words common in ordinary speech ("are", "see",
+# "why", "tea", "oh", "eye") are left out so sentences don't turn into letters.
+_LETTERS = {
+    "ay": "a", "bee": "b", "cee": "c", "dee": "d", "ee": "e", "eff": "f",
+    "gee": "g", "aitch": "h", "jay": "j", "kay": "k", "el": "l", "em": "m",
+    "en": "n", "pee": "p", "cue": "q", "ar": "r",
+    "ess": "s", "tee": "t", "vee": "v", "double you": "w", "ex": "x",
+    "wye": "y", "zee": "z", "zed": "z",
+}
+_NUMBERS = {"zero": "0", "one": "1", "two": "2", "three": "3", "four": "4",
+            "five": "5", "six": "6", "seven": "7", "eight": "8", "nine": "9", "ten": "10"}
+_FILLER = {"the", "app", "application", "program", "my"}
+
+
+def normalize(name: str) -> str:
+    """Lowercase, spoken letters/numbers → characters, merge single-letter runs ("v s code" → "vs code")."""
+    t = re.sub(r"[^\w\s]", " ", (name or "").lower())
+    t = re.sub(r"\bdouble you\b", "w", t)
+    raw = [w for w in t.split() if w not in _FILLER]
+    spelled = [w in _LETTERS for w in raw]
+    words = [_LETTERS[w] if spelled[i] and ((i and spelled[i - 1]) or (i + 1 < len(raw) and spelled[i + 1]))
+             else _NUMBERS.get(w, w) for i, w in enumerate(raw)]
+    out: List[str] = []
+    prev_single = False
+    for w in words:
+        single = len(w) == 1
+        if single and prev_single:
+            out[-1] += w
+        else:
+            out.append(w)
+        prev_single = single
+    return " ".join(out)
+
+
+def _compact(key: str) -> str:
+    return key.replace(" ", "")
+
+
+def _keys_for(*names: str) -> List[str]:
+    keys = []
+    for n in names:
+        k = normalize(n)
+        if not k:
+            continue
+        keys.append(k)
+        keys.append(_compact(k))
+        words = k.split()
+        if len(words) > 1:
+            keys.append("".join(w[0] for w in words))   # "visual studio code" → "vsc"
+    return list(dict.fromkeys(keys))
+
+
+def _trigrams(key: str) -> set:
+    k = f" {_compact(key)} "
+    return {k[i:i + 3] for i in range(len(k) - 2)}
+
+
+# ------------------------ Scanners ------------------------
+def _parse_desktop(path: str) -> Optional[dict]:
+    fields: Dict[str, str] = {}
+    section = None
+    try:
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith("["):
+                    section = line
+                    continue
+                if section != "[Desktop Entry]" or "=" not in line:
+                    continue
+                k, v = line.split("=", 1)
+                fields.setdefault(k.strip(), v.strip())
+    except OSError:
+        return None
+    if fields.get("Type", "Application") != "Application":
+        return None
+    if fields.get("NoDisplay") == "true" or fields.get("Hidden") == "true" or not fields.get("Exec"):
+        return None
+    if fields.get("Terminal") == "true":
+        return None   # console programs (vim, htop) would run headless on our stdin
+    name = fields.get("Name") or Path(path).stem
+    names = [name, Path(path).stem.split(".")[-1], fields.get("GenericName", "")]
+    names += [k for k in fields.get("Keywords", "").split(";") if k]
+    # drop field codes like %f %U
+    argv = [a for a in shlex.split(fields["Exec"]) if not re.fullmatch(r"%[a-zA-Z]", a)]
+    return {"name": name, "path": path, "kind": "desktop", "cmd": argv, "keys": _keys_for(*names)}
+
+
+def _scan_desktop_dir(d: str) -> List[dict]:
+    out = []
+    try:
+        for e in os.scandir(d):
+            if e.name.endswith(".desktop"):
+                ent = _parse_desktop(e.path)
+                if ent:
+                    out.append(ent)
+    except OSError:
+        pass
+    return out
+
+
+def _scan_lnk_dir(d: str) -> List[dict]:
+    out = []
+    try:
+        for e in os.scandir(d):
+            if e.name.lower().endswith((".lnk", ".url", ".appref-ms")):
+                stem = os.path.splitext(e.name)[0]
+                if "uninstall" in stem.lower():
+                    continue
+                out.append({"name": stem, "path": e.path, "kind": "lnk", "keys": _keys_for(stem)})
+    except OSError:
+        pass
+    return out
+
+
+def _scan_app_dir(d: str) -> List[dict]:
+    out = []
+    try:
+        for e in os.scandir(d):
+            if e.name.endswith(".app"):
+                stem = e.name[:-4]
+                out.append({"name": stem, "path": e.path, "kind": "app", "keys": _keys_for(stem)})
+    except OSError:
+        pass
+    return out
+
+
+def _subdirs(d: str) -> List[str]:
+    try:
+        return sorted(e.path for e in os.scandir(d)
+                      if e.is_dir(follow_symlinks=False) and not e.name.endswith(".app"))
+    except OSError:
+        return []
+
+
+def _roots() -> List[tuple]:
+    """(directory, scanner, recurse) for this platform."""
+    roots = []
+    home = Path.home()
+    if os.name == "nt":
+        for base in (os.environ.get("ProgramData"), os.environ.get("APPDATA")):
+            if base:
+                roots.append((os.path.join(base, "Microsoft", "Windows", "Start Menu", "Programs"),
+                              _scan_lnk_dir, True))
+    elif sys.platform == "darwin":
+        for d in ("/Applications", "/System/Applications", str(home / "Applications")):
+            roots.append((d, _scan_app_dir, True))
+    else:
+        data_dirs = os.environ.get("XDG_DATA_DIRS", "/usr/local/share:/usr/share").split(":")
+        data_dirs = [os.environ.get("XDG_DATA_HOME", str(home / ".local" / "share"))] + data_dirs
+        data_dirs += ["/var/lib/flatpak/exports/share", str(home / ".local/share/flatpak/exports/share")]
+        for d in dict.fromkeys(data_dirs):
+            roots.append((os.path.join(d, "applications"), _scan_desktop_dir, True))
+    return roots
+
+
+# ------------------------ Index ------------------------
+class AppIndex:
+    def __init__(self, cache_file: str = CACHE_FILE, overrides: Optional[Dict[str, str]] = None,
+                 aliases: Optional[Dict[str, str]] = None):
+        self.cache_file = cache_file
+        self.overrides = overrides or {}
+        self.aliases = {normalize(k): normalize(v) for k, v in (aliases or {}).items()}
+        self._dirs: Dict[str, dict] = {}
+        self._exact: Dict[str, dict] = {}
+        self._keys: List[str] = []
+        self._key_entry: List[dict] = []
+        self._tri: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+        self.ready = threading.Event()
+        self._cache_loaded = False
+
+    # -------- cache --------
+    def _load_cache(self) -> None:
+        self._cache_loaded = True
+        try:
+            with open(self.cache_file, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == CACHE_VERSION:
+                self._dirs = data.get("dirs", {})
+        except (OSError, ValueError):
+            self._dirs = {}
+        self._rebuild()
+        if self._dirs:
+            self.ready.set()
+
+    def _save_cache(self) -> None:
+        os.makedirs(os.path.dirname(self.cache_file) or ".", exist_ok=True)
+        tmp = self.cache_file + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "dirs": self._dirs}, f)
+        os.replace(tmp, self.cache_file)
+
+    # -------- scanning --------
+    def refresh(self) -> int:
+        """Rescan directories whose mtime changed. Returns how many were rescanned."""
+        if not self._cache_loaded:
+            self._load_cache()   # usable straight away while the rescan runs
+        old, new, rescanned = self._dirs, {}, 0
+        for root, scan, recurse in _roots():
+            stack = [root]
+            while stack:
+                d = stack.pop()
+                if d in new:
+                    continue
+                try:
+                    mtime = os.stat(d).st_mtime
+                except OSError:
+                    continue
+                cached = old.get(d)
+                if cached and cached["mtime"] == mtime:
+                    new[d] = cached
+                else:
+                    new[d] = {"mtime": mtime, "entries": scan(d),
+                              "subdirs": _subdirs(d) if recurse else []}
+                    rescanned += 1
+                stack.extend(new[d]["subdirs"])
+        if rescanned or len(new) != len(old):
+            self._dirs = new
+            self._rebuild()
+            try:
+                self._save_cache()
+            except OSError as e:
+                print(f"[apps] could not save cache: {e!r}")
+        self.ready.set()
+        return rescanned
+
+    def refresh_async(self) -> threading.Thread:
+        def _run():
+            try:
+                n = self.refresh()
+                if n:
+                    print(f"[apps] indexed {len(self._key_entry)} names ({n} dirs rescanned)")
+            except Exception as e:
+                print(f"[apps] refresh failed: {e!r}")
+        t = threading.Thread(target=_run, name="apps-refresh", daemon=True)
+        t.start()
+        return t
+
+    def _rebuild(self) -> None:
+        entries: List[dict] = []
+        # first scanned wins among equal kinds, so walk directories in insertion order
+        for info in self._dirs.values():
+            entries.extend(info["entries"])
+        for name, path in self.overrides.items():
+            entries.append({"name": name, "path": path, "kind": "override", "keys": _keys_for(name)})
+
+        exact: Dict[str, dict] = {}
+        for ent in entries:
+            for k in ent["keys"]:
+                cur = exact.get(k)
+                if cur is None or _PRIORITY[ent["kind"]] < _PRIORITY[cur["kind"]]:
+                    exact[k] = ent
+        keys = list(exact)
+        tri: Dict[str, List[int]] = {}
+        for i, k in enumerate(keys):
+            for t in _trigrams(k):
+                tri.setdefault(t, []).append(i)
+        with self._lock:
+            self._exact, self._keys, self._key_entry, self._tri = exact, keys, [exact[k] for k in keys], tri
+
+    # -------- lookup / launch --------
+    def lookup(self, name: str, fuzzy: bool = True) -> Optional[dict]:
+        key = normalize(name)
+        if not key:
+            return None
+        if not self.ready.is_set():
+            if not self._cache_loaded:
+                self.refresh_async()
+            self.ready.wait(5.0)   # first scan on a cold cache
+        key = self.aliases.get(key, key)
+        with self._lock:
+            exact, keys, key_entry, tri = self._exact, self._keys, self._key_entry, self._tri
+        for k in (key, _compact(key)):
+            if k in exact:
+                return exact[k]
+        if not fuzzy:
+            return None
+        q = _trigrams(key)
+        hits: Counter = Counter()
+        for t in q:
+            hits.update(tri.get(t, ()))
+        best, best_score = None, FUZZY_MIN
+        for i, h in hits.most_common(20):
+            score = 2 * h / (len(q) + len(_trigrams(keys[i])))
+            if score > best_score or (score == best_score and best is not None
+                                      and _PRIORITY[key_entry[i]["kind"]] < _PRIORITY[best["kind"]]):
+                best, best_score = key_entry[i], score
+        return best
+
+    @staticmethod
+    def launch(ent: dict) -> bool:
+        try:
+            if os.name == "nt":
+                os.startfile(ent["path"])  # nosec - local desktop automation
+            elif ent["kind"] == "app":
+                subprocess.Popen(["open", ent["path"]])
+            else:
+                argv = ent["cmd"] if ent["kind"] == "desktop" else [ent["path"]]
+                subprocess.Popen(argv, start_new_session=True, stdin=subprocess.DEVNULL,
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            return True
+        except Exception as e:
+            print(f"[apps] launch failed for {ent.get('name')}: {e!r}")
+            return False
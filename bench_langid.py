@@ -0,0 +1,73 @@
+# bench_langid.py — cost of Whisper language ID vs decoding in a fixed language
+#
+# Usage:  python bench_langid.py path/to/wavs|recordings [--fixed en] [--repeat 3]
+#
+# Every clip is decoded in-process (listener_whisper.decode_pcm) twice per
+# repeat: once with --fixed as the language and once with language=None, i.e.
+# identify-then-transcribe in one pass. Short follow-ups in auto mode reuse the
+# session's language, so they cost the same as the fixed decode.
+from __future__ import annotations
+import argparse
+import collections
+import statistics
+import time
+from pathlib import Path
+
+import numpy as np
+
+import listener_whisper
+from bench_vad import load_corpus
+
+
+def _timed(pcm: bytes, language):
+    t0 = time.perf_counter()
+    res = listener_whisper.decode_pcm(pcm, language=language)
+    return time.perf_counter() - t0, res
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("corpus", type=Path)
+    ap.add_argument("--fixed", default="en", help="language for the fixed decode")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    if listener_whisper._backend() == "none":
+        raise SystemExit("Needs faster-whisper or openai-whisper")
+    clips = []
+    for x, rate in load_corpus(args.corpus):
+        if rate != listener_whisper.WHISPER_RATE:   # resample the same way the listener does
+            import speech_recognition as sr
+            audio = sr.AudioData((np.clip(x, -1, 1) * 32767).astype("<i2").tobytes(), rate, 2)
+            clips.append(listener_whisper.to_pcm16k(audio))
+        else:
+            clips.append((np.clip(x, -1, 1) * 32767).astype("<i2").tobytes())
+    if not clips:
+        raise SystemExit(f"No .wav files or recordings under {args.corpus}")
+
+    listener_whisper.preload()
+    _timed(clips[0], args.fixed)   # first call pays for model warm-up
+
+    fixed, auto, overhead = [], [], []
+    langs = collections.Counter()
+    for _ in range(args.repeat):
+        for pcm in clips:
+            tf, _ = _timed(pcm, args.fixed)
+            ta, res = _timed(pcm, None)
+            fixed.append(tf)
+            auto.append(ta)
+            overhead.append(ta - tf)
+            langs[res[2] if res else "none"] += 1
+
+    print(f"{len(clips)} clips x {args.repeat}")
+    for name, vals in (("fixed", fixed), ("auto", auto), ("overhead", overhead)):
+        vals.sort()
+        p90 = vals[min(len(vals) - 1, int(0.9 * len(vals)))]
+        print(f"{name:9s} mean={statistics.mean(vals) * 1000:7.1f} ms  "
+              f"median={statistics.median(vals) * 1000:7.1f} ms  p90={p90 * 1000:7.1f} ms")
+    print(f"overhead  {statistics.mean(overhead) / statistics.mean(fixed):+.1%} of a fixed-language decode")
+    print("detected  " + ", ".join(f"{k}: {v}" for k, v in langs.most_common()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# bench_loudness.py — cost of loudness analysis per track
+#
+# Usage:  python bench_loudness.py [music_folder] [--workers 2]
+#
+# Serial pass: decode + analysis time per track (and per minute of audio).
+# Pool pass: wall time for analyze_all on a fresh cache with N workers.
+from __future__ import annotations
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import loudness
+from config import MUSIC_FOLDER
+from music import SUPPORTED
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("folder", nargs="?", default=MUSIC_FOLDER)
+    ap.add_argument("--workers", type=int, default=loudness.ANALYSIS_WORKERS)
+    args = ap.parse_args()
+
+    paths = sorted(p for p in Path(args.folder).rglob("*") if p.suffix.lower() in SUPPORTED and p.is_file())
+    if not paths:
+        raise SystemExit(f"No audio files under {args.folder}")
+
+    print(f"{'track':32s} {'dur s':>7s} {'decode ms':>10s} {'analyse ms':>11s} {'LUFS':>7s} {'peak dB':>8s}")
+    per_min = []
+    for p in paths:
+        r = loudness.analyze(p.as_posix())
+        per_min.append((r["decode_s"] + r["analyze_s"]) / max(r["duration"] / 60, 1e-6))
+        print(f"{p.name[:32]:32s} {r['duration']:7.1f} {r['decode_s'] * 1000:10.1f} "
+              f"{r['analyze_s'] * 1000:11.1f} {r['lufs']:7.1f} {r['peak_db']:8.1f}")
+    print(f"\nserial: median {statistics.median(per_min) * 1000:.0f} ms per minute of audio")
+
+    with tempfile.TemporaryDirectory() as d:
+        cache = loudness.LoudnessCache(str(Path(d) / "loudness.json"))
+        t0 = time.perf_counter()
+        n = loudness.analyze_all(paths, cache, workers=args.workers)
+        cold = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        again = loudness.analyze_all(paths, cache, workers=args.workers)
+        warm = time.perf_counter() - t0
+    print(f"pool ({args.workers} workers, incl. process start): {n} tracks in {cold:.2f}s "
+          f"({cold / n * 1000:.0f} ms/track); re-run decoded {again} in {warm * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
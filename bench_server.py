@@ -0,0 +1,128 @@
+# bench_server.py — load test for server.py: turns/s and tail latency
+#
+# Usage:  python bench_server.py [--url http://127.0.0.1:8765] [--sessions 50,100,250,500]
+#                                [--duration 20] [--ai] [--spawn]
+#
+# Each simulated client opens a session and sends text turns back to back on
+# a keep-alive connection. Latency is measured to the final "done" event.
+# --ai mixes in questions that fall through to the local LLM (needs Ollama).
+# --spawn starts an in-process server on a free port first, with notes and the
+# retrieval index in a scratch directory (load-test notes never reach the repo).
+from __future__ import annotations
+import argparse
+import http.client
+import json
+import random
+import os
+import statistics
+import tempfile
+import threading
+import time
+from typing import List
+from urllib.parse import urlparse
+
+COMMANDS = [
+    "what's the time", "what's the date", "help", "play music", "next song",
+    "pause", "take a note buy milk", "set a timer for 2 seconds", "open youtube",
+]
+AI_QUESTIONS = ["what is the capital of nepal", "tell me something about the moon"]
+
+
+def _pct(vals: List[float], q: float) -> float:
+    return vals[min(len(vals) - 1, int(q * len(vals)))] if vals else float("nan")
+
+
+def _client(host: str, port: int, stop_at: float, commands: List[str],
+            lat: List[float], errors: List[str], lock: threading.Lock) -> None:
+    try:
+        conn = http.client.HTTPConnection(host, port, timeout=120)
+        conn.request("POST", "/session", body=b"{}", headers={"Content-Type": "application/json"})
+        sid = json.loads(conn.getresponse().read())["session"]
+    except Exception as e:
+        with lock:
+            errors.append(repr(e))
+        return
+    mine = []
+    while time.perf_counter() < stop_at:
+        body = json.dumps({"text": random.choice(commands)}).encode()
+        t0 = time.perf_counter()
+        try:
+            conn.request("POST", f"/turn?session={sid}", body=body,
+                         headers={"Content-Type": "application/json"})
+            events = conn.getresponse().read().decode("utf-8").splitlines()
+            if not events or json.loads(events[-1]).get("type") != "done":
+                raise RuntimeError("turn ended without done event")
+            mine.append(time.perf_counter() - t0)
+        except Exception as e:
+            with lock:
+                errors.append(repr(e))
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=120)
+    try:
+        conn.request("DELETE", f"/session?session={sid}")
+        conn.getresponse().read()
+        conn.close()
+    except Exception:
+        pass
+    with lock:
+        lat.extend(mine)
+
+
+def run_level(host: str, port: int, n: int, duration: float, commands: List[str]) -> dict:
+    lat: List[float] = []
+    errors: List[str] = []
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+    threads = [threading.Thread(target=_client, args=(host, port, stop_at, commands, lat, errors, lock),
+                                daemon=True) for _ in range(n)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+    lat.sort()
+    return {
+        "sessions": n, "turns": len(lat), "errors": len(errors),
+        "turns_per_s": len(lat) / wall if wall else 0.0,
+        "p50_ms": _pct(lat, 0.50) * 1000, "p95_ms": _pct(lat, 0.95) * 1000,
+        "p99_ms": _pct(lat, 0.99) * 1000,
+        "mean_ms": statistics.mean(lat) * 1000 if lat else float("nan"),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default="http://127.0.0.1:8765")
+    ap.add_argument("--sessions", default="50,100,250,500")
+    ap.add_argument("--duration", type=float, default=20.0, help="seconds per level")
+    ap.add_argument("--ai", action="store_true", help="include LLM fallback questions")
+    ap.add_argument("--spawn", action="store_true", help="start server.py in this process")
+    args = ap.parse_args()
+
+    u = urlparse(args.url)
+    host, port = u.hostname or "127.0.0.1", u.port or 8765
+    scratch = None
+    if args.spawn:
+        scratch = tempfile.TemporaryDirectory(prefix="jarvis-bench-", ignore_cleanup_errors=True)
+        import config
+        config.INDEX_DIR = os.path.join(scratch.name, "index")   # before anything reads it
+        import server
+        server.NOTES_DIR = os.path.join(scratch.name, "notes")
+        srv = server.make_server(host, 0)
+        port = srv.server_address[1]
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+
+    commands = COMMANDS + (AI_QUESTIONS if args.ai else [])
+    print(f"{'sessions':>8s} {'turns':>7s} {'turns/s':>8s} {'p50 ms':>8s} "
+          f"{'p95 ms':>8s} {'p99 ms':>8s} {'errors':>7s}")
+    for n in (int(x) for x in args.sessions.split(",")):
+        r = run_level(host, port, n, args.duration, commands)
+        print(f"{r['sessions']:8d} {r['turns']:7d} {r['turns_per_s']:8.1f} {r['p50_ms']:8.1f} "
+              f"{r['p95_ms']:8.1f} {r['p99_ms']:8.1f} {r['errors']:7d}")
+    if scratch:
+        scratch.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+# bench_soak.py — long-running soak test: does anything grow turn after turn?
+#
+# Usage:  python bench_soak.py [--turns 5000] [--sample-every 100] [--warmup 0.2] [--json out.json]
+#
+# Drives the real turn path (listener.capture → vad.record → listener_race →
+# handle_question) with stubbed edges:
+#   audio   — a fake sr.Microphone that serves a synthetic utterance
+#   STT     — Google / Whisper stubs that return the scripted command
+#   network — Ollama and NewsAPI are served by a stub HTTP server in a
+#             subprocess (so its sockets don't count here); ai.py / news.py
+#             talk to it through their normal pooled sessions
+#   output  — TTS, browser and app launches are no-ops
+# Every --sample-every turns we sample RSS, threads, open fds, sockets and open
+# mic streams, then fit a line over the samples after --warmup. A resource
+# fails when its slope per 1k turns is over its limit. Exit status 1 on failure.
+from __future__ import annotations
+import argparse
+import contextlib
+import gc
+import json
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")      # no sound device needed
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+# Growth allowed per 1k turns before a resource counts as leaking
+LIMITS = {"rss_mb": 2.0, "threads": 0.5, "fds": 0.5, "sockets": 0.5, "mic_streams": 0.5}
+
+SCRIPT = [
+    "what's the time", "what's the date", "play music", "next song", "pause", "resume",
+    "take a note buy milk", "set a timer for 1 second", "news", "news about technology",
+    "open youtube", "search google for cats", "what is the capital of nepal",
+    "tell me something about the moon", "stop music", "help",
+]
+NOTES_RESET = 500   # truncate the notes file this often so the workload stays stationary
+
+
+# ------------------------ Stub network ------------------------
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, body: bytes, ctype: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):   # NewsAPI top-headlines
+        arts = [{"title": f"Headline {i}"} for i in range(3)]
+        self._send(json.dumps({"status": "ok", "articles": arts}).encode(), "application/json")
+
+    def do_POST(self):  # Ollama /api/chat (streamed) and /api/generate (warm-up)
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.path.startswith("/api/chat"):
+            toks = ["The ", "answer ", "is ", "stubbed."]
+            lines = [json.dumps({"message": {"role": "assistant", "content": t}, "done": False})
+                     for t in toks] + [json.dumps({"done": True})]
+            self._send(("\n".join(lines) + "\n").encode(), "application/x-ndjson")
+        else:
+            self._send(b"{}", "application/json")
+
+
+def _serve_stub(port_q) -> None:
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    srv.daemon_threads = True
+    port_q.put(srv.server_address[1])
+    srv.serve_forever()
+
+
+# ------------------------ Stub audio / STT ------------------------
+_next_text = ""
+_mic_open = 0
+_mic_lock = threading.Lock()
+
+
+def _utterance(rate: int) -> bytes:
+    """Noise, then ~1.2 s of voiced, syllable-modulated harmonics, then trailing noise."""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(1.2 * rate)) / rate
+    voiced = sum(np.sin(2 * np.pi * 140 * k * t) / k for k in range(1, 20))
+    voiced *= 0.15 * (0.6 + 0.4 * np.sin(2 * np.pi * 4 * t) ** 2)
+    x = np.concatenate([np.zeros(int(0.8 * rate)), voiced, np.zeros(int(2.0 * rate))])
+    x += rng.normal(0, 0.002, len(x))
+    return (np.clip(x, -1, 1) * 32767).astype("<i2").tobytes()
+
+
+class _FakeStream:
+    def __init__(self, pcm: bytes, width: int):
+        self.pcm, self.width, self.pos = pcm, width, 0
+
+    def read(self, frames: int) -> bytes:
+        n = frames * self.width
+        chunk = self.pcm[self.pos:self.pos + n]
+        self.pos += n
+        return chunk + b"\0" * (n - len(chunk))   # silence once the utterance is used up
+
+
+class FakeMicrophone:
+    """Stands in for sr.Microphone; counts streams left open."""
+    _pcm: Dict[int, bytes] = {}
+
+    def __init__(self, device_index=None, sample_rate=16000, chunk_size=1024):
+        self.SAMPLE_RATE, self.SAMPLE_WIDTH, self.CHUNK = sample_rate, 2, chunk_size
+        self.stream: Optional[_FakeStream] = None
+
+    def __enter__(self):
+        global _mic_open
+        pcm = self._pcm.get(self.SAMPLE_RATE) or self._pcm.setdefault(self.SAMPLE_RATE,
+                                                                     _utterance(self.SAMPLE_RATE))
+        self.stream = _FakeStream(pcm, self.SAMPLE_WIDTH)
+        with _mic_lock:
+            _mic_open += 1
+        return self
+
+    def __exit__(self, *exc):
+        global _mic_open
+        self.stream = None
+        with _mic_lock:
+            _mic_open -= 1
+
+
+def _stub_google(audio, language="en-US", debug=False):
+    time.sleep(0.002)
+    return (_next_text, 0.9) if audio.frame_data else None
+
+
+def _stub_whisper(audio, language="en", debug=False):
+    time.sleep(0.004)
+    return (_next_text, 0.7, language or "en") if audio.frame_data else None
+
+
+# ------------------------ Resource sampling ------------------------
+def _proc_sample() -> Dict[str, float]:
+    """RSS / fds / sockets from /proc (Linux) or psutil (elsewhere, if installed)."""
+    if os.path.isdir("/proc/self/fd"):
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        fds = socks = 0
+        for fd in os.listdir("/proc/self/fd"):
+            try:
+                target = os.readlink(f"/proc/self/fd/{fd}")
+            except OSError:
+                continue   # the listdir handle itself, already closed
+            fds += 1
+            socks += target.startswith("socket:")
+        return {"rss_mb": rss / 2**20, "fds": fds, "sockets": socks}
+    try:
+        import psutil
+    except ImportError:
+        raise SystemExit("Resource sampling needs /proc or the psutil package")
+    p = psutil.Process()
+    fds = p.num_handles() if os.name == "nt" else p.num_fds()
+    return {"rss_mb": p.memory_info().rss / 2**20, "fds": fds,
+            "sockets": len(p.net_connections(kind="all"))}
+
+
+def sample(turn: int) -> Dict[str, float]:
+    gc.collect()   # cyclic garbage isn't a leak; don't let it look like one
+    s = {"turn": turn, "threads": threading.active_count(), "mic_streams": _mic_open}
+    s.update(_proc_sample())
+    return s
+
+
+def slopes(samples: List[dict], warmup: float) -> Dict[str, float]:
+    """Least-squares growth per 1k turns, ignoring the warm-up part of the run."""
+    start = samples[-1]["turn"] * warmup
+    use = [s for s in samples if s["turn"] >= start]
+    if len(use) < 3:
+        return {k: 0.0 for k in LIMITS}
+    x = np.array([s["turn"] for s in use], dtype=float)
+    return {k: float(np.polyfit(x, np.array([s[k] for s in use], dtype=float), 1)[0] * 1000)
+            for k in LIMITS}
+
+
+# ------------------------ Driver ------------------------
+def setup(tmp: Path):
+    """Point the assistant at the stubs and a scratch directory; returns (main, player)."""
+    import speech_recognition as sr
+    import webbrowser
+
+    sr.Microphone = FakeMicrophone
+    webbrowser.open = lambda url, *a, **kw: True
+
+    ctx = mp.get_context("spawn")
+    port_q = ctx.Queue()
+    ctx.Process(target=_serve_stub, args=(port_q,), daemon=True).start()
+    base = f"http://127.0.0.1:{port_q.get(timeout=30)}"
+
+    import ai
+    import apps
+    import listener
+    import listener_whisper
+    import news
+    import retrieval
+    import main
+    from config import MUSIC_FOLDER
+    from music import MusicPlayer
+
+    ai.OLLAMA_BASE_URL = base
+    news._BASE = f"{base}/v2/top-headlines"
+    news.NEWS_API_KEY = "soak"
+    listener.recognize = _stub_google
+    listener_whisper.transcribe = _stub_whisper
+    main.speak = lambda text, chunked=True: None
+    main.NOTES_FILE = str(tmp / "notes.txt")
+    main._apps = apps.AppIndex(cache_file=str(tmp / "apps.json"),
+                               overrides=main.APP_PATHS, aliases=main.APP_ALIASES)
+    main._apps.launch = lambda ent: True
+    retrieval._index = retrieval.Index(str(tmp / "index"))
+
+    player = MusicPlayer(MUSIC_FOLDER)
+    player.scan_async()
+    return main, player
+
+
+def run(turns: int, sample_every: int, tmp: Path) -> List[dict]:
+    global _next_text
+    import listener_race
+    main, player = setup(tmp)
+
+    samples = []
+    misses = 0
+    out = sys.stdout
+    t0 = time.perf_counter()
+    print(f"{'turn':>7s} {'rss MB':>8s} {'threads':>8s} {'fds':>6s} {'sockets':>8s} {'mic':>4s} {'turns/s':>8s}")
+    # the assistant logs every turn (and timers / re-indexing from other threads)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for i in range(turns + 1):
+            if i % sample_every == 0:
+                s = sample(i)
+                samples.append(s)
+                rate = i / (time.perf_counter() - t0) if i else 0.0
+                print(f"{i:7d} {s['rss_mb']:8.1f} {s['threads']:8d} {s['fds']:6d} "
+                      f"{s['sockets']:8d} {s['mic_streams']:4d} {rate:8.1f}", file=out, flush=True)
+            if i == turns:
+                break
+            if i and i % NOTES_RESET == 0:
+                open(main.NOTES_FILE, "w").close()
+            _next_text = SCRIPT[i % len(SCRIPT)]
+            heard = listener_race.listen(timeout=5, phrase_time_limit=None)
+            if heard != _next_text:
+                misses += 1
+                continue
+            main.handle_question(heard, player)
+        time.sleep(1.5)   # let the last timers fire before the scratch dir goes away
+    if misses:
+        print(f"[soak] {misses} turn(s) captured no utterance")
+    return samples
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--turns", type=int, default=5000)
+    ap.add_argument("--sample-every", type=int, default=100)
+    ap.add_argument("--warmup", type=float, default=0.2, help="fraction of the run ignored for slopes")
+    ap.add_argument("--json", type=Path, help="write samples and slopes here")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="jarvis-soak-") as d:
+        samples = run(args.turns, args.sample_every, Path(d))
+
+    sl = slopes(samples, args.warmup)
+    failed = [k for k, v in sl.items() if v > LIMITS[k]]
+    print(f"\n{'resource':>12s} {'start':>8s} {'end':>8s} {'peak':>8s} {'per 1k':>8s} {'limit':>7s}")
+    for k in LIMITS:
+        vals = [s[k] for s in samples]
+        print(f"{k:>12s} {vals[0]:8.1f} {vals[-1]:8.1f} {max(vals):8.1f} {sl[k]:+8.2f} {LIMITS[k]:7.1f}"
+              f"{'  LEAK' if k in failed else ''}")
+    if args.json:
+        args.json.write_text(json.dumps({"samples": samples, "slopes_per_1k": sl, "failed": failed},
+                                        indent=2), encoding="utf-8")
+    if failed:
+        print(f"\n[soak] FAIL: {', '.join(failed)} keep growing")
+        sys.exit(1)
+    print("\n[soak] OK: no resource grows with turn count")
+
+
+if __name__ == "__main__":
+    main()
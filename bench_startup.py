@@ -0,0 +1,119 @@
+# bench_startup.py — import-time breakdown + time to first wake-ready
+#
+# Usage:  python bench_startup.py [--runs 5] [--top 15] [--history INDEX_DIR/bench_startup.jsonl]
+#
+# "wake-ready" = process start → main.startup() returned, i.e. the moment the
+# loop would open the mic for the wake word. Each run appends one JSON line to
+# the history file (with the git revision) so regressions show up over time.
+# The measured processes get a scratch INDEX_DIR, so the background work
+# startup() kicks off (app scan, retrieval index, loudness analysis) never
+# writes to the real index; the first run sees cold caches, later ones warm.
+from __future__ import annotations
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from config import INDEX_DIR
+
+HERE = Path(__file__).resolve().parent
+
+# argv[1] = scratch INDEX_DIR, patched in before any module reads it. os._exit:
+# don't wait for the background work (e.g. the loudness pool) startup() started
+_WAKE_SNIPPET = (
+    "import os, sys, time; t0 = time.perf_counter(); import config; config.INDEX_DIR = sys.argv[1]; "
+    "import main; t1 = time.perf_counter(); "
+    "main.startup(); t2 = time.perf_counter(); "
+    "print('BENCH', t1 - t0, t2 - t0, flush=True); os._exit(0)"
+)
+
+
+def import_breakdown() -> list[tuple[str, int, int]]:
+    """(module, self µs, cumulative µs) from `python -X importtime -c 'import main'`."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                          cwd=HERE, capture_output=True, text=True, env=_env())
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = [p.strip() for p in line[len("import time:"):].split("|")]
+        if not parts[0].isdigit():
+            continue   # header line
+        rows.append((parts[2], int(parts[0]), int(parts[1])))
+    return rows
+
+
+def wake_ready(index_dir: str) -> tuple[float, float, float]:
+    """(import main s, wake-ready s in-process, wall s including interpreter start)."""
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", _WAKE_SNIPPET, index_dir], cwd=HERE,
+                          capture_output=True, text=True, env=_env(), timeout=120)
+    wall = time.perf_counter() - t0
+    for line in proc.stdout.splitlines():
+        if line.startswith("BENCH "):
+            _, imp, ready = line.split()
+            return float(imp), float(ready), wall
+    raise RuntimeError(f"startup failed:\n{proc.stderr[-2000:]}")
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    return env
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                              capture_output=True, text=True).stdout.strip()
+    except Exception:
+        return ""
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--top", type=int, default=15)
+    ap.add_argument("--history", type=Path, default=HERE / INDEX_DIR / "bench_startup.jsonl")
+    args = ap.parse_args()
+
+    rows = import_breakdown()
+    total_us = next((cum for mod, _, cum in rows if mod == "main"), 0)
+    print(f"import main: {total_us / 1000:.1f} ms cumulative\n")
+    print(f"{'module':40s} {'self ms':>8s} {'cum ms':>8s}")
+    for mod, self_us, cum_us in sorted(rows, key=lambda r: r[2], reverse=True)[: args.top]:
+        print(f"{mod:40s} {self_us / 1000:8.1f} {cum_us / 1000:8.1f}")
+
+    with tempfile.TemporaryDirectory(prefix="jarvis-startup-") as d:
+        runs = [wake_ready(d) for _ in range(args.runs)]
+    imp = statistics.median(r[0] for r in runs)
+    ready = statistics.median(r[1] for r in runs)
+    wall = statistics.median(r[2] for r in runs)
+    print(f"\nmedian of {args.runs}: import={imp * 1000:.0f} ms  "
+          f"wake-ready={ready * 1000:.0f} ms  wall (incl. interpreter)={wall * 1000:.0f} ms")
+
+    record = {
+        "ts": datetime.now().isoformat(timespec="seconds"),
+        "rev": _git_rev(),
+        "python": sys.version.split()[0],
+        "import_main_ms": round(total_us / 1000, 1),
+        "import_ms": round(imp * 1000, 1),
+        "wake_ready_ms": round(ready * 1000, 1),
+        "wall_ms": round(wall * 1000, 1),
+        "top": [{"module": m, "cum_ms": round(c / 1000, 1)}
+                for m, _, c in sorted(rows, key=lambda r: r[2], reverse=True)[: args.top]],
+    }
+    args.history.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.history, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+    print(f"appended to {args.history}")
+
+
+if __name__ == "__main__":
+    main()
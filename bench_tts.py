@@ -0,0 +1,87 @@
+# bench_tts.py — silence between spoken chunks: synchronous SAPI vs pipelined
+#
+# Usage:  python bench_tts.py [--runs 3] [--text "..."]   (Windows, SAPI + PyAudio)
+#
+# Speaks the same multi-sentence reply both ways and reports the audible gap
+# between consecutive chunks (end of speech in chunk n → start of speech in n+1):
+#   sync       trailing silence SAPI renders after chunk n + Speak() start-up for
+#              chunk n+1 (its wall time minus its audio length) + its leading silence
+#   pipelined  SENTENCE_GAP_S kept by trimming + time playback waited for chunk
+#              n+1 to finish rendering (tts.last_gaps())
+from __future__ import annotations
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+import tts
+
+TEXT = ("Here is what I found. The capital of Nepal is Kathmandu, in the Kathmandu Valley. "
+        "It has been the seat of government since the eighteenth century. "
+        "The city sits at about fourteen hundred metres above sea level. "
+        "Its old squares are listed as a world heritage site. "
+        "Would you like to hear more about its history?")
+
+
+def _edges(pcm: bytes) -> tuple[float, float, float]:
+    """(leading silence, trailing silence, total) seconds of an untrimmed render."""
+    x = np.abs(np.frombuffer(pcm, dtype="<i2").astype(np.int32))
+    loud = np.flatnonzero(x > tts.SILENCE_LEVEL)
+    total = len(x) / tts.RATE
+    if not len(loud):
+        return total, 0.0, total
+    return loud[0] / tts.RATE, (len(x) - 1 - loud[-1]) / tts.RATE, total
+
+
+def bench_sync(parts: list[str]) -> list[float]:
+    # render() runs on the caller's thread here; that's fine for measuring edges
+    edges = [_edges(tts.render(p, trim=False)) for p in parts]
+    walls = []
+    for p in parts:
+        t0 = time.perf_counter()
+        tts._sapi.Speak(p)
+        walls.append(time.perf_counter() - t0)
+    # Speak() returns when its audio is done, so wall - audio is start-up overhead
+    return [edges[i][1] + max(0.0, walls[i + 1] - edges[i + 1][2]) + edges[i + 1][0]
+            for i in range(len(parts) - 1)]
+
+
+def bench_pipelined(text: str) -> list[float]:
+    tts.speak(text)
+    if tts._pipeline_error:
+        raise SystemExit(f"Pipelined speech unavailable: {tts._pipeline_error}")
+    return [tts.SENTENCE_GAP_S + w for w in tts.last_gaps()]
+
+
+def _summary(name: str, gaps: list[float]) -> None:
+    if not gaps:
+        print(f"{name:>10s}  (single chunk)")
+        return
+    ms = sorted(g * 1000 for g in gaps)
+    print(f"{name:>10s} {len(ms):5d} {statistics.mean(ms):8.0f} {statistics.median(ms):8.0f} "
+          f"{ms[-1]:8.0f}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--text", default=TEXT)
+    args = ap.parse_args()
+
+    if tts._engine() is None:
+        raise SystemExit("Needs Windows SAPI (pywin32)")
+    parts = tts._chunks(args.text)
+    print(f"{len(parts)} chunks, {args.runs} run(s) per mode\n")
+
+    sync, piped = [], []
+    for _ in range(args.runs):
+        sync += bench_sync(parts)
+        piped += bench_pipelined(args.text)
+    print(f"{'mode':>10s} {'gaps':>5s} {'mean ms':>8s} {'p50 ms':>8s} {'max ms':>8s}")
+    _summary("sync", sync)
+    _summary("pipelined", piped)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# bench_vad.py — end-of-speech → text latency on a recorded corpus
+#
+# Usage:  python bench_vad.py path/to/wavs [--pause 1.8] [--transcribe]
+#         python bench_vad.py recordings        (a corpus written by recorder.py)
+#
+# Each WAV is one utterance (16-bit PCM, mono) with some trailing silence.
+# From a recorder corpus only raw captures are used (recorded with
+# RECORD_POST_ROLL ≥ --pause): the normal recordings were already cut by the VAD,
+# so replaying them would measure the endpointer against itself.
+# Reference speech end = last frame clearly above the file's noise floor
+# (non-causal, so it sees the whole file). We then compare when each
+# endpointer would have stopped recording:
+#   energy  — speech_recognition style: fixed energy threshold + pause_threshold
+#   vad     — vad.Endpointer (adaptive hangover)
+# With --transcribe the VAD-cut audio is also run through listener_whisper
+# and the decode time is added, giving end-of-speech → text.
+from __future__ import annotations
+import argparse
+import statistics
+import time
+import wave
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+
+import vad
+
+
+def load_wav(path: Path) -> tuple[np.ndarray, int]:
+    with wave.open(str(path), "rb") as w:
+        if w.getsampwidth() != 2:
+            raise ValueError(f"{path}: need 16-bit PCM")
+        raw = w.readframes(w.getnframes())
+        x = vad.pcm_to_float(raw)
+        if w.getnchannels() > 1:
+            x = x.reshape(-1, w.getnchannels()).mean(axis=1)
+        return x, w.getframerate()
+
+
+def load_corpus(root: Path, raw_only: bool = False) -> Iterator[tuple[np.ndarray, int]]:
+    """
+    WAV files under `root`, or a recorder.py corpus if there are none.
+    raw_only: only uncut captures (RECORD_POST_ROLL), for replaying endpointing.
+    """
+    files = sorted(root.rglob("*.wav"))
+    for f in files:
+        yield load_wav(f)
+    if not files:
+        import recorder
+        for u in recorder.iter_corpus(str(root)):
+            if raw_only and not u.raw:
+                continue
+            a = u.audio().get_raw_data(convert_width=2)
+            yield vad.pcm_to_float(a), u.rate
+
+
+def _frame_db(x: np.ndarray, frame_len: int) -> np.ndarray:
+    n = len(x) // frame_len
+    frames = x[: n * frame_len].reshape(n, frame_len)
+    return 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+
+
+def reference_end(x: np.ndarray, rate: int) -> Optional[float]:
+    frame_len = int(rate * vad.FRAME_MS / 1000)
+    db = _frame_db(x, frame_len)
+    floor = np.percentile(db, 10)
+    loud = np.nonzero(db > floor + 2 * vad.MARGIN_DB)[0]
+    return (loud[-1] + 1) * frame_len / rate if len(loud) else None
+
+
+def energy_end(x: np.ndarray, rate: int, pause: float, calib: float = 0.5) -> Optional[float]:
+    """Fixed-threshold endpointing, like Recognizer.listen after adjust_for_ambient_noise."""
+    frame_len = int(rate * vad.FRAME_MS / 1000)
+    db = _frame_db(x, frame_len)
+    n_cal = max(1, int(calib * 1000 / vad.FRAME_MS))
+    threshold = db[:n_cal].mean() + 3.5   # energy_threshold ≈ 1.5× ambient RMS
+    frame_s = frame_len / rate
+    started, silence = False, 0.0
+    for i, d in enumerate(db):
+        if d > threshold:
+            started, silence = True, 0.0
+        elif started:
+            silence += frame_s
+            if silence >= pause:
+                return (i + 1) * frame_s
+    return None
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("corpus", type=Path)
+    ap.add_argument("--pause", type=float, default=1.8, help="baseline pause_threshold")
+    ap.add_argument("--max-hangover", type=float, default=vad.MAX_HANGOVER)
+    ap.add_argument("--transcribe", action="store_true")
+    args = ap.parse_args()
+
+    rows = {"energy": [], "vad": [], "vad+stt": []}
+    clips = early = 0
+    for x, rate in load_corpus(args.corpus, raw_only=True):
+        clips += 1
+        ref = reference_end(x, rate)
+        if ref is None:
+            continue
+        e = energy_end(x, rate, args.pause)
+        v = vad.endpoint_offline(x, rate, max_hangover=args.max_hangover)
+        if e is not None:
+            rows["energy"].append(e - ref)
+        if v is None:
+            continue
+        if v < ref:
+            early += 1   # cut the speaker off mid-utterance
+        rows["vad"].append(v - ref)
+        if args.transcribe:
+            import speech_recognition as sr
+            import listener_whisper
+            cut = (np.clip(x[: int(v * rate)], -1, 1) * 32767).astype("<i2").tobytes()
+            t0 = time.perf_counter()
+            listener_whisper.transcribe(sr.AudioData(cut, rate, 2), language="en")
+            rows["vad+stt"].append(v - ref + time.perf_counter() - t0)
+
+    if not clips:
+        raise SystemExit(f"No .wav files or raw recordings (RECORD_POST_ROLL) under {args.corpus}")
+    print(f"{clips} clips, {early} cut early by VAD")
+    for name, vals in rows.items():
+        if not vals:
+            continue
+        vals.sort()
+        p90 = vals[min(len(vals) - 1, int(0.9 * len(vals)))]
+        print(f"{name:8s} n={len(vals):4d}  mean={statistics.mean(vals):.3f}s  "
+              f"median={statistics.median(vals):.3f}s  p90={p90:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,3 +4,17 @@ MUSIC_FOLDER = "./music"
 OLLAMA_BASE_URL = "http://localhost:11434"
 #OLLAMA_MODEL = "llama3"   # or "phi3", "gemma2", etc.
 OLLAMA_MODEL = "phi3:mini"   # or "mistral:7b", "llama3:8b-instruct"
+# Tiny model for chit-chat / trivia and as the fallback when OLLAMA_MODEL is slow
+OLLAMA_FAST_MODEL = "qwen2.5:0.5b"   # or "tinyllama", "gemma2:2b"
+AI_FIRST_TOKEN_BUDGET = 3.0   # seconds to wait for the first token before falling back
+AI_CANNED_REPLY = "Sorry, I'm a bit slow right now. Please ask me again in a moment."
+# Local retrieval for the AI fallback (retrieval.py)
+DOCS_FOLDER = "./documents"   # .txt / .md files the assistant may quote from
+INDEX_DIR = "./.jarvis_index"
+# Opt-in utterance recorder (recorder.py): keeps captured audio + transcripts for tuning
+RECORD_UTTERANCES = False
+RECORDINGS_DIR = "./recordings"
+# > 0: also keep listening this long after the VAD cut and record the raw capture
+# (calibration, lead-in, post-roll) so bench_vad.py can replay endpointing on it.
+# Every reply is delayed by this much, so only use it to collect a corpus.
+RECORD_POST_ROLL = 0.0
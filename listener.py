@@ -4,6 +4,10 @@ import time
 from typing import Optional
 import speech_recognition as sr
 
+import recorder
+import vad
+from config import RECORD_POST_ROLL
+
 # Default mic index; set to None to use system default
 DEFAULT_MIC_INDEX: Optional[int] = None
 
@@ -11,9 +15,12 @@ DEFAULT_MIC_INDEX: Optional[int] = None
 CALIBRATION_TIME = 0.5
 
 # VAD / recognition tuning
-PAUSE_THRESHOLD = 0.8      # seconds of silence that stops listening
-PHRASE_THRESHOLD = 0.3     # minimum speech length considered valid
-NON_SPEAKING_DURATION = 0.2
+# Frame-level VAD (vad.py) ends short commands after ~0.35s of silence and
+# waits up to PAUSE_THRESHOLD mid-sentence. Set False for the old energy endpointing.
+USE_VAD = True
+PAUSE_THRESHOLD = 1.0         # max seconds of silence to end phrase (VAD hangover cap)
+PHRASE_THRESHOLD = 0.15       # min speech length (short)
+NON_SPEAKING_DURATION = 0.3   # pre/post roll
 
 
 def list_microphones() -> list[str]:
@@ -24,19 +31,12 @@ def list_microphones() -> list[str]:
     return sr.Microphone.list_microphone_names()
 
 
-# listener.py
-# ...
-# Make pauses feel natural (increase these a bit)
-PAUSE_THRESHOLD = 1.8         # seconds of silence to end phrase (was 0.8)
-PHRASE_THRESHOLD = 0.15       # min speech length (short)
-NON_SPEAKING_DURATION = 0.3   # pre/post roll
-
-def listen(timeout=None, phrase_time_limit=None, language="en-US",
-           mic_index: int | None = DEFAULT_MIC_INDEX, debug: bool = False,
-           # NEW: optional VAD overrides per call
-           pause_threshold: float | None = None,
-           non_speaking_duration: float | None = None,
-           phrase_threshold: float | None = None) -> Optional[str]:
+def capture(timeout=None, phrase_time_limit=None,
+            mic_index: int | None = DEFAULT_MIC_INDEX, debug: bool = False,
+            pause_threshold: float | None = None,
+            non_speaking_duration: float | None = None,
+            phrase_threshold: float | None = None) -> Optional[sr.AudioData]:
+    """Record one utterance from the mic. Returns AudioData or None."""
     r = sr.Recognizer()
 
     # Apply defaults, allow per-call overrides
@@ -47,13 +47,37 @@ def listen(timeout=None, phrase_time_limit=None, language="en-US",
 
     # Pick the microphone
     try:
-        mic = sr.Microphone(device_index=mic_index)
+        if USE_VAD:
+            mic = sr.Microphone(device_index=mic_index, sample_rate=vad.SAMPLE_RATE,
+                                chunk_size=vad.SAMPLE_RATE * vad.FRAME_MS // 1000)
+        else:
+            mic = sr.Microphone(device_index=mic_index)
     except Exception as e:
         if debug:
             print(f"[listener] Could not open microphone (index={mic_index}): {e!r}")
         return None
 
     with mic as source:
+        if USE_VAD:
+            # VAD calibrates its own noise floor from the first CALIBRATION_TIME seconds
+            # endpointing corpus: keep the uncut capture for recorder.begin()
+            raw = [] if RECORD_POST_ROLL > 0 and recorder.get() else None
+            try:
+                audio = vad.record(source, timeout=timeout, phrase_time_limit=phrase_time_limit,
+                                   max_hangover=r.pause_threshold, calibration=CALIBRATION_TIME,
+                                   raw_out=raw, post_roll=RECORD_POST_ROLL)
+                if raw is not None:
+                    recorder.note_raw(sr.AudioData(b"".join(raw), source.SAMPLE_RATE, source.SAMPLE_WIDTH))
+                return audio
+            except sr.WaitTimeoutError:
+                if debug:
+                    print("[listener] Timeout waiting for speech start.")
+                return None
+            except Exception as e:
+                if debug:
+                    print(f"[listener] Error during VAD capture: {e!r}")
+                return None
+
         # Small ambient noise calibration
         try:
             r.adjust_for_ambient_noise(source, duration=CALIBRATION_TIME)
@@ -65,7 +89,7 @@ def listen(timeout=None, phrase_time_limit=None, language="en-US",
 
         # Listen for speech
         try:
-            audio = r.listen(source, timeout=timeout, phrase_time_limit=phrase_time_limit)
+            return r.listen(source, timeout=timeout, phrase_time_limit=phrase_time_limit)
         except sr.WaitTimeoutError:
             if debug:
                 print("[listener] Timeout waiting for speech start.")
@@ -76,16 +100,49 @@ def listen(timeout=None, phrase_time_limit=None, language="en-US",
             return None
 
 
-    # Recognize
+def recognize(audio: sr.AudioData, language: str = "en-US",
+              debug: bool = False) -> Optional[tuple[str, Optional[float]]]:
+    """
+    Google recognition of already-captured audio.
+    Returns (text, confidence) or None; confidence is None when Google didn't report
+    one. Raises sr.RequestError on network failure so callers can tell "offline"
+    from "didn't understand".
+    """
     try:
-        text = r.recognize_google(audio, language=language)
-        if debug:
-            print(f"[listener] Heard ({language}): {text}")
-        return text
+        result = sr.Recognizer().recognize_google(audio, language=language, show_all=True)
     except sr.UnknownValueError:
+        result = None
+    if not result or not result.get("alternative"):
         if debug:
             print("[listener] Speech unintelligible.")
         return None
+    best = result["alternative"][0]
+    text = best.get("transcript", "")
+    # Google only reports confidence on the top alternative, and not always
+    conf = float(best["confidence"]) if "confidence" in best else None
+    if debug:
+        print(f"[listener] Heard ({language}, conf={conf}): {text}")
+    return (text, conf) if text else None
+
+
+def listen(timeout=None, phrase_time_limit=None, language="en-US",
+           mic_index: int | None = DEFAULT_MIC_INDEX, debug: bool = False,
+           # NEW: optional VAD overrides per call
+           pause_threshold: float | None = None,
+           non_speaking_duration: float | None = None,
+           phrase_threshold: float | None = None) -> Optional[str]:
+    audio = capture(timeout=timeout, phrase_time_limit=phrase_time_limit,
+                    mic_index=mic_index, debug=debug,
+                    pause_threshold=pause_threshold,
+                    non_speaking_duration=non_speaking_duration,
+                    phrase_threshold=phrase_threshold)
+    if audio is None:
+        return None
+
+    # Recognize
+    try:
+        heard = recognize(audio, language=language, debug=debug)
+        return heard[0] if heard else None
     except sr.RequestError as e:
         if debug:
             print(f"[listener] Recognition service error: {e!r}")
@@ -0,0 +1,241 @@
+# listener_race.py — one capture, Google and local Whisper racing on the same audio
+from __future__ import annotations
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+import speech_recognition as sr
+
+import listener
+import listener_whisper
+import recorder
+from session import Session, current as current_session
+
+# Accept the first result at or above this confidence; otherwise wait for the other one
+MIN_CONFIDENCE = 0.6
+# While Whisper is still identifying the language, Google (decoding in the session's
+# language) is accepted on its own only at or above this; wrong-language decodes score low.
+# A result without a reported confidence is never accepted unchecked.
+UNVERIFIED_CONFIDENCE = 0.8
+# Score for a Google result that came without confidence (speech_recognition's own default)
+UNKNOWN_CONFIDENCE = 0.5
+# After a Google network error, skip the cloud backend for this long (seconds)
+OFFLINE_BACKOFF = 30.0
+# Give up on recognition entirely after this long (seconds)
+RECOGNIZE_TIMEOUT = 15.0
+
+# language="auto": Whisper identifies the language and the session remembers it.
+# Utterances up to FOLLOWUP_SECONDS long reuse the remembered language (no language ID)
+# while it is younger than LANG_TTL seconds. A confident Google result doesn't wait for
+# language ID; Whisper's verdict still updates the session when it lands.
+AUTO = "auto"
+FOLLOWUP_SECONDS = 4.0
+LANG_TTL = 120.0
+LANG_TAGS = {"en": "en-US", "ne": "ne-NP"}   # Whisper code → Google / TTS language tag
+
+# A slow loser finishes in the background and is ignored; spare workers keep it
+# from delaying the next turn
+_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="stt")
+_offline_until = 0.0
+
+
+@dataclass
+class BackendStats:
+    attempts: int = 0
+    wins: int = 0
+    failures: int = 0
+    total_latency: float = 0.0
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.attempts if self.attempts else 0.0
+
+    @property
+    def mean_latency(self) -> float:
+        done = self.attempts - self.failures
+        return self.total_latency / done if done else 0.0
+
+
+_STATS: Dict[str, BackendStats] = {"google": BackendStats(), "whisper": BackendStats()}
+_STATS_LOCK = threading.Lock()
+
+
+def stats() -> Dict[str, BackendStats]:
+    """Snapshot of per-backend win rate and latency."""
+    with _STATS_LOCK:
+        return {k: BackendStats(**vars(v)) for k, v in _STATS.items()}
+
+
+def is_offline() -> bool:
+    return time.monotonic() < _offline_until
+
+
+def _google(audio: sr.AudioData, language: str, debug: bool):
+    global _offline_until
+    try:
+        res = listener.recognize(audio, language=language, debug=debug)
+        return (*res, language) if res else None
+    except sr.RequestError as e:
+        _offline_until = time.monotonic() + OFFLINE_BACKOFF
+        if debug: print(f"[race] Google unreachable, local only for {OFFLINE_BACKOFF:.0f}s: {e!r}")
+        return None
+
+
+def _whisper(audio: sr.AudioData, language: Optional[str], debug: bool):
+    # Whisper wants "en", not "en-US"; None = identify the language
+    return listener_whisper.transcribe(audio, language=language and language.split("-")[0], debug=debug)
+
+
+_BACKENDS: Dict[str, Callable] = {"google": _google, "whisper": _whisper}
+
+
+def _timed(name: str, audio: sr.AudioData, language: Optional[str], debug: bool):
+    t0 = time.perf_counter()
+    try:
+        res = _BACKENDS[name](audio, language, debug)
+    except Exception as e:
+        if debug: print(f"[race] {name} error: {e!r}")
+        res = None
+    dt = time.perf_counter() - t0
+    with _STATS_LOCK:
+        st = _STATS[name]
+        st.attempts += 1
+        if res is None:
+            st.failures += 1
+        else:
+            st.total_latency += dt
+    if debug: print(f"[race] {name} finished in {dt:.2f}s → {res!r}")
+    return res
+
+
+def _plan(audio: sr.AudioData, language: str, sess: Session) -> tuple[str, Optional[str]]:
+    """(Google language tag, Whisper language or None to identify it) for this utterance."""
+    if language != AUTO:
+        return language, language.split("-")[0]
+    secs = len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+    if sess.lang_at and secs <= FOLLOWUP_SECONDS and time.time() - sess.lang_at < LANG_TTL:
+        return sess.lang, sess.lang.split("-")[0]
+    return sess.lang, None
+
+
+def _score(res: tuple) -> float:
+    return UNKNOWN_CONFIDENCE if res[1] is None else res[1]
+
+
+def _pick(results: Dict[str, tuple], google_lang: str, identified: bool) -> Optional[tuple[str, tuple]]:
+    """Most confident (backend, (text, conf, lang)); drops Google if it decoded the wrong language."""
+    cands = dict(results)
+    w = results.get("whisper")
+    if identified and w and "google" in cands and LANG_TAGS.get(w[2], w[2]) != google_lang:
+        del cands["google"]
+    if not cands:
+        return None
+    name = max(cands, key=lambda n: _score(cands[n]))
+    return name, cands[name]
+
+
+def _remember_lang(sess: Session, fut) -> None:
+    """Done-callback for a Whisper language ID that lost the race: keep its verdict."""
+    if fut.cancelled():
+        return
+    res = fut.result()
+    if res is not None:
+        sess.lang, sess.lang_at = LANG_TAGS.get(res[2], sess.lang), time.time()
+
+
+def recognize(audio: sr.AudioData, language: str = "en-US", debug: bool = False,
+              sess: Optional[Session] = None) -> Optional[str]:
+    """
+    Run both backends on the same audio and return the first confident transcript.
+    language="auto" lets Whisper identify the language (or reuses the session's for a
+    short follow-up) and stores it in sess.lang; a very confident Google result is
+    returned without waiting for it.
+    """
+    sess = sess or current_session()
+    google_lang, whisper_lang = _plan(audio, language, sess)
+    identify = whisper_lang is None
+    names = ["whisper"] if is_offline() else ["google", "whisper"]
+    pending = {_POOL.submit(_timed, n, audio, google_lang if n == "google" else whisper_lang, debug): n
+               for n in names}
+    results: Dict[str, tuple] = {}
+    whisper_done = False
+    best: Optional[tuple[str, tuple]] = None
+    deadline = time.monotonic() + RECOGNIZE_TIMEOUT
+
+    while pending:
+        done, _ = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                       return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for fut in done:
+            name = pending.pop(fut)
+            whisper_done |= name == "whisper"
+            res = fut.result()
+            if res is not None:
+                results[name] = res
+        if identify and not whisper_done:
+            # Google decoded in the session's language; take it unchecked only if it's sure
+            g = results.get("google")
+            if g and g[1] is not None and g[1] >= UNVERIFIED_CONFIDENCE:
+                break
+            continue
+        best = _pick(results, google_lang, identify)
+        if best and _score(best[1]) >= MIN_CONFIDENCE:
+            break
+    best = _pick(results, google_lang, identify)
+
+    # Losers keep running on their worker but their result is ignored
+    for fut in pending:
+        fut.cancel()
+    if language == AUTO:
+        whisper_fut = next((f for f, n in pending.items() if n == "whisper"), None)
+        if identify and whisper_fut is not None and best and _score(best[1]) >= MIN_CONFIDENCE:
+            sess.lang_at = time.time()   # Google won early; language ID corrects this when done
+            whisper_fut.add_done_callback(lambda f: _remember_lang(sess, f))
+        elif identify and "whisper" in results:
+            sess.lang, sess.lang_at = LANG_TAGS.get(results["whisper"][2], sess.lang), time.time()
+        elif best and _score(best[1]) >= MIN_CONFIDENCE:
+            sess.lang_at = time.time()   # confident follow-up: keep the language
+        else:
+            sess.lang_at = 0.0           # it didn't fit; identify again next time
+    if best is None:
+        return None
+    name, (text, conf, lang) = best
+    with _STATS_LOCK:
+        _STATS[name].wins += 1
+    if debug: print(f"[race] winner={name} conf={conf} lang={lang}")
+    return text
+
+
+def listen(timeout=None, phrase_time_limit=None, language="en-US",
+           mic_index: int | None = listener.DEFAULT_MIC_INDEX, debug: bool = False,
+           pause_threshold: float | None = None,
+           non_speaking_duration: float | None = None,
+           phrase_threshold: float | None = None) -> Optional[str]:
+    """Drop-in for listener.listen: capture once, recognise with both backends (language="auto" allowed)."""
+    t0 = time.perf_counter()
+    audio = listener.capture(timeout=timeout, phrase_time_limit=phrase_time_limit,
+                             mic_index=mic_index, debug=debug,
+                             pause_threshold=pause_threshold,
+                             non_speaking_duration=non_speaking_duration,
+                             phrase_threshold=phrase_threshold)
+    if audio is None:
+        return None
+    t1 = time.perf_counter()
+    text = recognize(audio, language=language, debug=debug)
+    recorder.begin(audio, text, capture_s=t1 - t0, stt_s=time.perf_counter() - t1)
+    return text
+
+
+# Convenience: quick CLI test
+if __name__ == "__main__":
+    print("Say something (Ctrl+C to quit)…")
+    try:
+        while True:
+            print("->", listen(timeout=5, phrase_time_limit=8, debug=True))
+    except KeyboardInterrupt:
+        for name, st in stats().items():
+            print(f"{name}: win_rate={st.win_rate:.0%} mean_latency={st.mean_latency:.2f}s "
+                  f"attempts={st.attempts}")
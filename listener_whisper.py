@@ -1,11 +1,17 @@
 # listener_whisper.py
 from __future__ import annotations
+from concurrent.futures import Future
 from typing import Optional
-import tempfile
+import json
+import math
 import os
+import threading
 
+import numpy as np
 import speech_recognition as sr
 
+from config import INDEX_DIR
+
 # --------- Mic tuning (reuse your working device) ----------
 DEFAULT_MIC_INDEX: Optional[int] = None   # set to your working index if needed
 CALIBRATION_TIME = 0.6
@@ -14,38 +20,114 @@ PHRASE_THRESHOLD = 0.2
 NON_SPEAKING_DURATION = 0.15
 # -----------------------------------------------------------
 
-# Try to import faster-whisper first; fall back to openai-whisper
-_USE_FASTER = False
-try:
-    from faster_whisper import WhisperModel
-    _USE_FASTER = True
-except Exception:
+# --------- Transcription workers (whisper_service.py) ------
+SERVICE_WORKERS = 1    # separate processes holding the model; 0 = decode in the calling thread
+CPU_THREADS = 0        # decoder threads per worker; 0 = library default
+JOB_TIMEOUT = 15.0     # give up on an utterance after this long (seconds); hung workers are restarted
+WHISPER_RATE = 16000   # Whisper models expect 16 kHz mono
+# -----------------------------------------------------------
+
+# Languages the assistant understands; language ID (language=None) picks among these
+LANGUAGES = ("en", "ne")
+
+# --------- Model choice ------------------------------------
+# Defaults; `python stt_tune.py` benchmarks this machine and writes TUNE_FILE,
+# which overrides them at import (set USE_TUNING = False to keep these).
+MODEL_SIZE = "small"     # "small" is a good balance; "base" for weaker CPUs
+DEVICE = "cpu"           # "cuda" if you have an Nvidia GPU (faster-whisper)
+COMPUTE_TYPE = "auto"    # faster-whisper: "int8", "int8_float32", "float32", ...
+BEAM_SIZE = 1
+USE_TUNING = True
+TUNE_FILE = os.path.join(INDEX_DIR, "stt_tune.json")
+# -----------------------------------------------------------
+
+
+_PREFERRED: Optional[str] = None   # backend the saved tuning was measured on
+
+def load_tuning(path: str = TUNE_FILE) -> Optional[dict]:
+    """Apply a saved stt_tune.py result to the settings above. Returns it, or None."""
+    global MODEL_SIZE, DEVICE, COMPUTE_TYPE, BEAM_SIZE, CPU_THREADS, _PREFERRED
     try:
-        import whisper  # type: ignore
-        _USE_FASTER = False
-    except Exception:
-        whisper = None  # type: ignore
-        _USE_FASTER = False
+        with open(path, encoding="utf-8") as f:
+            cfg = json.load(f)["config"]
+    except (OSError, ValueError, KeyError):
+        return None
+    MODEL_SIZE = cfg.get("model", MODEL_SIZE)
+    DEVICE = cfg.get("device", DEVICE)
+    COMPUTE_TYPE = cfg.get("compute_type", COMPUTE_TYPE)
+    BEAM_SIZE = cfg.get("beam_size", BEAM_SIZE)
+    CPU_THREADS = cfg.get("cpu_threads", CPU_THREADS)
+    _PREFERRED = cfg.get("backend")
+    return cfg
+
+
+if USE_TUNING:
+    load_tuning()
+
+# Backend is picked on first use (importing faster-whisper/torch is slow):
+# the tuned one if it's installed, else faster-whisper first, then openai-whisper
+_BACKEND: Optional[str] = None   # "faster" | "whisper" | "none"
+_BACKEND_MODULES = {"faster": "faster_whisper", "whisper": "whisper"}
+
+def _backend() -> str:
+    global _BACKEND
+    if _BACKEND is None:
+        order = sorted(_BACKEND_MODULES, key=lambda b: (b != _PREFERRED, b != "faster"))
+        _BACKEND = "none"
+        for b in order:
+            try:
+                __import__(_BACKEND_MODULES[b])
+                _BACKEND = b
+                break
+            except Exception:
+                continue
+    return _BACKEND
 
 # Lazy-loaded models
 _faster_model = None
 _whisper_model = None
 
-def _get_faster_model(device: str = "cpu", compute_type: str = "auto"):
+def _get_faster_model():
     global _faster_model
     if _faster_model is None:
-        # choose model size: "small" is a good balance; use "base" for weaker CPUs
-        _faster_model = WhisperModel("small", device=device, compute_type=compute_type)
+        from faster_whisper import WhisperModel
+        _faster_model = WhisperModel(MODEL_SIZE, device=DEVICE, compute_type=COMPUTE_TYPE,
+                                     cpu_threads=CPU_THREADS)
     return _faster_model
 
 def _get_whisper_model():
     global _whisper_model
     if _whisper_model is None:
         import whisper  # type: ignore
-        # choose model size: "small" is a good start; "base" is lighter
-        _whisper_model = whisper.load_model("small")
+        _whisper_model = whisper.load_model(MODEL_SIZE, device=DEVICE)
+        if CPU_THREADS:
+            import torch  # type: ignore
+            torch.set_num_threads(CPU_THREADS)
     return _whisper_model
 
+
+def preload() -> None:
+    """Load the model now instead of on the first utterance."""
+    if _backend() == "faster":
+        _get_faster_model()
+    elif _backend() == "whisper":
+        _get_whisper_model()
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_service():
+    """Shared out-of-process transcription service, started on first use."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            from whisper_service import WhisperService
+            _service = WhisperService(workers=SERVICE_WORKERS, cpu_threads=CPU_THREADS,
+                                      job_timeout=JOB_TIMEOUT)
+        return _service
+
 def _new_recognizer() -> sr.Recognizer:
     r = sr.Recognizer()
     r.pause_threshold = PAUSE_THRESHOLD
@@ -93,36 +175,89 @@ def listen(
         if debug: print(f"[whisper-listener] mic open/close error: {e!r}")
         return None
 
-    # 2) Dump to a temp WAV for Whisper
-    wav_bytes = audio.get_wav_data()
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as f:
-        tmp_path = f.name
-        f.write(wav_bytes)
+    heard = transcribe(audio, language=language, debug=debug)
+    return heard[0] if heard else None
+
+
+def to_pcm16k(audio: sr.AudioData) -> bytes:
+    """16 kHz, 16-bit mono PCM as Whisper wants it."""
+    return audio.get_raw_data(convert_rate=WHISPER_RATE, convert_width=2)
+
+
+def _best_allowed(probs: dict) -> str:
+    return max(LANGUAGES, key=lambda lang: probs.get(lang, 0.0))
 
-    # 3) Transcribe with Whisper (faster-whisper preferred)
+
+def _detect_whisper(model, samples: np.ndarray) -> str:
+    """openai-whisper language ID on the first 30 s window, limited to LANGUAGES."""
+    import whisper  # type: ignore
+    mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(samples),
+                                      n_mels=getattr(model.dims, "n_mels", 80)).to(model.device)
+    _, probs = model.detect_language(mel)
+    return _best_allowed(probs)
+
+
+def decode_pcm(pcm: bytes, language: Optional[str] = "en",
+               debug: bool = False) -> Optional[tuple[str, float, str]]:
+    """
+    Run the model in this process on 16 kHz int16 PCM.
+    language=None identifies the language (one of LANGUAGES) from the first window
+    and transcribes in it, in the same call.
+    Returns (text, confidence, language) or None; confidence is exp(mean avg_logprob) in 0..1.
+    """
+    samples = np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768.0
     try:
-        if _USE_FASTER:
-            model = _get_faster_model(device="cpu", compute_type="auto")  # set device="cuda" if you have Nvidia GPU
-            # VAD filtering helps on noisy mics
-            segments, info = model.transcribe(tmp_path, language=language, vad_filter=True, beam_size=1)
+        if _backend() == "faster":
+            model = _get_faster_model()
+            # VAD filtering helps on noisy mics. With language=None the encoder output of the
+            # first window is used for detection and then reused for decoding (single pass).
+            segments, info = model.transcribe(samples, language=language, vad_filter=True, beam_size=BEAM_SIZE)
+            lang = info.language
+            if language is None and lang not in LANGUAGES:
+                # e.g. Nepali heard as Hindi: nothing is decoded yet (segments is lazy),
+                # so restart in the likeliest language we support
+                lang = _best_allowed(dict(info.all_language_probs or ()))
+                segments, info = model.transcribe(samples, language=lang, vad_filter=True, beam_size=BEAM_SIZE)
+            segments = list(segments)
             text = "".join(seg.text for seg in segments).strip()
-            if debug: print(f"[whisper-listener] ({language}) → {text!r}")
-            return text or None
+            logprobs = [seg.avg_logprob for seg in segments]
         else:
-            if 'whisper' not in globals() or whisper is None:
+            if _backend() == "none":
                 if debug: print("[whisper-listener] Neither faster-whisper nor openai-whisper available.")
                 return None
             model = _get_whisper_model()
             # original whisper uses language codes like "ne", "en"
-            result = model.transcribe(tmp_path, language=language, fp16=False)
+            lang = language or _detect_whisper(model, samples)
+            result = model.transcribe(samples, language=lang, fp16=DEVICE == "cuda",
+                                      beam_size=BEAM_SIZE if BEAM_SIZE > 1 else None)
             text = (result.get("text") or "").strip()
-            if debug: print(f"[whisper-listener] ({language}) → {text!r}")
-            return text or None
+            logprobs = [seg["avg_logprob"] for seg in result.get("segments", [])]
+        conf = math.exp(sum(logprobs) / len(logprobs)) if logprobs else 0.0
+        if debug: print(f"[whisper-listener] ({lang}{'' if language else ' detected'}, conf={conf:.2f}) → {text!r}")
+        return (text, conf, lang) if text else None
     except Exception as e:
         if debug: print(f"[whisper-listener] Transcription error: {e!r}")
         return None
-    finally:
-        try:
-            os.unlink(tmp_path)
-        except Exception:
-            pass
+
+
+def transcribe_async(audio: sr.AudioData, language: Optional[str] = "en") -> Future:
+    """Queue audio on the worker processes; the Future resolves to (text, confidence, language) or None."""
+    return get_service().submit(to_pcm16k(audio), language=language)
+
+
+def transcribe(audio: sr.AudioData, language: Optional[str] = "en",
+               debug: bool = False) -> Optional[tuple[str, float, str]]:
+    """
+    Transcribe already-captured audio locally with Whisper (language=None: detect it).
+    Uses the worker processes when SERVICE_WORKERS > 0, otherwise decodes here.
+    """
+    if SERVICE_WORKERS <= 0:
+        return decode_pcm(to_pcm16k(audio), language=language, debug=debug)
+    try:
+        # the service fails the job at JOB_TIMEOUT; the margin covers its 1 s check interval
+        res = transcribe_async(audio, language=language).result(timeout=JOB_TIMEOUT + 2.0)
+    except Exception as e:
+        if debug: print(f"[whisper-listener] Worker error: {e!r}")
+        return None
+    if debug: print(f"[whisper-listener] ({language}) → {res!r}")
+    return res
@@ -0,0 +1,183 @@
+# loudness.py — integrated loudness (BS.1770-style LUFS) + peak for the music library
+#
+# Tracks are decoded once with pygame in worker processes. Loudness comes from
+# K-weighted power on 100 ms sub-blocks (the K-weighting curve is applied in the
+# frequency domain so everything stays vectorised), 400 ms gating blocks built
+# from 4 sub-blocks, absolute (-70 LUFS) and relative (-10 LU) gates.
+# Results are cached by path + mtime + size, so only new/changed files are decoded.
+from __future__ import annotations
+import json
+import multiprocessing as mp
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional
+
+import numpy as np
+
+from config import INDEX_DIR
+
+CACHE_FILE = os.path.join(INDEX_DIR, "loudness.json")
+TARGET_LUFS = -23.0        # EBU R128 level; louder tracks are turned down to it (keeps voice commands audible)
+PEAK_CEILING_DB = -1.0     # never push a track's sample peak above this
+ANALYSIS_WORKERS = 2
+
+# K-weighting biquads (ITU-R BS.1770, specified at 48 kHz)
+_K_STAGES = (
+    ((1.53512485958697, -2.69169618940638, 1.19839281085285), (1.0, -1.69065929318241, 0.73248077421585)),
+    ((1.0, -2.0, 1.0), (1.0, -1.99004745483398, 0.99007225036621)),
+)
+_SUB_BLOCK_S = 0.1
+_ABS_GATE = -70.0
+_REL_GATE = -10.0
+
+
+def _k_weight_power(freqs: np.ndarray) -> np.ndarray:
+    """|H(f)|² of the K-weighting filter."""
+    z = np.exp(-2j * np.pi * np.minimum(freqs, 23999.0) / 48000.0)
+    h = np.ones_like(z)
+    for b, a in _K_STAGES:
+        h *= (b[0] + b[1] * z + b[2] * z * z) / (a[0] + a[1] * z + a[2] * z * z)
+    return np.abs(h) ** 2
+
+
+def integrated_loudness(samples: np.ndarray, rate: int, chunk: int = 256) -> float:
+    """LUFS of float samples shaped (n,) or (n, channels) in [-1, 1]."""
+    if samples.ndim == 1:
+        samples = samples[:, None]
+    sub = int(rate * _SUB_BLOCK_S)
+    n_sub = samples.shape[0] // sub
+    if n_sub < 4:
+        return float("-inf")
+    weight = _k_weight_power(np.fft.rfftfreq(sub, 1.0 / rate))
+    power = np.zeros(n_sub)
+    for ch in range(samples.shape[1]):
+        frames = samples[: n_sub * sub, ch].reshape(n_sub, sub)
+        for i in range(0, n_sub, chunk):   # bound memory on long tracks
+            spec = np.fft.rfft(frames[i:i + chunk], axis=1)
+            # Parseval: mean square of the filtered frame from its weighted spectrum
+            e = (np.abs(spec) ** 2 * weight).sum(axis=1)
+            e -= 0.5 * (np.abs(spec[:, 0]) ** 2 * weight[0])
+            if sub % 2 == 0:
+                e -= 0.5 * (np.abs(spec[:, -1]) ** 2 * weight[-1])
+            power[i:i + chunk] += 2.0 * e / (sub * sub)
+    # 400 ms blocks with 75 % overlap = mean of 4 consecutive 100 ms sub-blocks
+    cs = np.concatenate([[0.0], np.cumsum(power)])
+    blocks = (cs[4:] - cs[:-4]) / 4.0
+    lufs = -0.691 + 10.0 * np.log10(blocks + 1e-12)
+    gated = blocks[lufs > _ABS_GATE]
+    if not len(gated):
+        return float("-inf")
+    rel = -0.691 + 10.0 * np.log10(gated.mean()) + _REL_GATE
+    final = blocks[(lufs > _ABS_GATE) & (lufs > rel)]
+    return float(-0.691 + 10.0 * np.log10(final.mean()))
+
+
+def peak_db(samples: np.ndarray) -> float:
+    p = float(np.abs(samples).max()) if samples.size else 0.0
+    return float(20.0 * np.log10(p)) if p > 0 else float("-inf")
+
+
+def decode(path: str) -> tuple[np.ndarray, int]:
+    """Decode any pygame-supported file to float32 (n, channels)."""
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")   # no sound device needed
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    import pygame
+    from pygame import mixer
+    if not mixer.get_init():
+        mixer.init(frequency=44100, size=-16, channels=2)
+    rate, _, _ = mixer.get_init()
+    arr = pygame.sndarray.array(mixer.Sound(path))
+    return arr.astype(np.float32) / 32768.0, rate
+
+
+def analyze(path: str) -> dict:
+    """Decode one track and measure it. Runs in a worker process."""
+    t0 = time.perf_counter()
+    x, rate = decode(path)
+    t1 = time.perf_counter()
+    lufs = integrated_loudness(x, rate)
+    pk = peak_db(x)
+    t2 = time.perf_counter()
+    return {"lufs": lufs, "peak_db": pk, "duration": len(x) / rate,
+            "decode_s": t1 - t0, "analyze_s": t2 - t1}
+
+
+def gain_db(lufs: float, peak: float, target: float = TARGET_LUFS) -> float:
+    """Gain that brings the track to `target`, capped by the peak ceiling."""
+    if not np.isfinite(lufs):
+        return 0.0
+    return min(target - lufs, PEAK_CEILING_DB - peak) if np.isfinite(peak) else target - lufs
+
+
+class LoudnessCache:
+    """path → analysis results, keyed on mtime + size."""
+
+    def __init__(self, cache_file: str = CACHE_FILE):
+        self.cache_file = cache_file
+        self._lock = threading.Lock()
+        try:
+            with open(cache_file, encoding="utf-8") as f:
+                self._data: Dict[str, dict] = json.load(f)
+        except (OSError, ValueError):
+            self._data = {}
+
+    @staticmethod
+    def _stamp(p: Path) -> tuple[float, int]:
+        st = p.stat()
+        return st.st_mtime, st.st_size
+
+    def get(self, path: Path) -> Optional[dict]:
+        key = path.resolve().as_posix()
+        with self._lock:
+            rec = self._data.get(key)
+        try:
+            if rec and (rec["mtime"], rec["size"]) == self._stamp(path):
+                return rec
+        except OSError:
+            pass
+        return None
+
+    def put(self, path: Path, result: dict) -> None:
+        mtime, size = self._stamp(path)
+        with self._lock:
+            self._data[path.resolve().as_posix()] = dict(result, mtime=mtime, size=size)
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.cache_file) or ".", exist_ok=True)
+        with self._lock:
+            data = json.dumps(self._data)
+        tmp = self.cache_file + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp, self.cache_file)
+
+    def stale(self, paths: Iterable[Path]) -> list[Path]:
+        return [p for p in paths if self.get(p) is None]
+
+
+def analyze_all(paths: Iterable[Path], cache: LoudnessCache, workers: int = ANALYSIS_WORKERS,
+                on_result: Optional[Callable[[Path, dict], None]] = None) -> int:
+    """Analyse tracks missing from the cache on a process pool. Returns how many were decoded."""
+    todo = cache.stale(paths)
+    if not todo:
+        return 0
+    done = 0
+    ctx = mp.get_context("spawn")   # fresh processes; don't fork the player's mixer
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(todo))), mp_context=ctx) as pool:
+        futs = {pool.submit(analyze, p.as_posix()): p for p in todo}
+        for fut in as_completed(futs):
+            p = futs[fut]
+            try:
+                res = fut.result()
+            except Exception as e:
+                print(f"[loudness] {p.name}: {e!r}")
+                continue
+            cache.put(p, res)
+            done += 1
+            if on_result:
+                on_result(p, res)
+    cache.save()
+    return done
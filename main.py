@@ -1,79 +1,121 @@
 import os
+import re
 import time
+import heapq
+import itertools
 import webbrowser
 import threading
+import contextvars
+from contextlib import nullcontext
 from datetime import datetime
-from pathlib import Path
+from typing import Optional
 
 from tts import speak, set_voice, list_voices, stop_speaking, pause_speaking, resume_speaking
-from listener import listen
+from listener_race import listen  # Google + local Whisper on the same capture
 from music import MusicPlayer
 from news import get_headlines
-from config import MUSIC_FOLDER
-from ai import ask_ai_stream  # streaming Ollama client
+from config import MUSIC_FOLDER, DOCS_FOLDER
+from ai import ask_ai_routed, warm_models  # streaming Ollama client + model router
+from session import Session, current as current_session, activate, deactivate
+import retrieval
+import recorder
+from apps import AppIndex
+from nepali_support import apply_language
 
 # ------------------------ Settings ------------------------
 WAKE_WORDS = {"prajwol", "prajwal", "hey prajwal", "hey prajwol","siri"}
 QUESTION_TIMEOUT_SECS = 10
+LANGUAGE = "auto"        # commands: "auto" = Whisper language ID (English/Nepali), or e.g. "en-US"
 NOTES_FILE = "notes.txt"
+RETRIEVAL_CHARS = 3000   # note/document passages added to the AI prompt (~750 tokens of num_ctx 2048)
 # ----------------------------------------------------------
 
 
 # ---------- Desktop apps you want to launch by name ----------
+# Installed apps are found automatically (apps.py: .desktop, Start Menu, .app).
+# Programs that are only on PATH are never launched by voice unless listed here.
 APP_PATHS = {
-    "notepad": r"C:\Windows\System32\notepad.exe",
-    "calculator": r"C:\Windows\System32\calc.exe",
-    # Adjust this VS Code path if yours is different:
-    "vs code": r"C:\Users\prajw\AppData\Local\Programs\Microsoft VS Code\Code.exe",
-    "visual studio code": r"C:\Users\prajw\AppData\Local\Programs\Microsoft VS Code\Code.exe",
-    "code": r"C:\Users\prajw\AppData\Local\Programs\Microsoft VS Code\Code.exe",
+    # "my tool": r"C:\Tools\mytool.exe",
 }
+if os.name == "nt":
+    APP_PATHS.update({"notepad": "notepad.exe", "calc": "calc.exe"})   # no Start Menu shortcut
 APP_ALIASES = {
-    "vscode": "vs code",
-    "vs code": "vs code",
-    "visual studio code": "visual studio code",
-    "code": "vs code",
+    "vscode": "visual studio code",
+    "vs code": "visual studio code",
+    "text editor": "notepad" if os.name == "nt" else "text editor",
+    "calculator": "calc" if os.name == "nt" else "calculator",
 }
-APP_KEYWORDS = {"open app", "launch", "start", "run"}
+APP_KEYWORDS = ("open app", "launch", "start", "run")
 
+_apps = AppIndex(overrides=APP_PATHS, aliases=APP_ALIASES)
 
-def normalize_app_name(name: str) -> str:
-    n = (name or "").strip().lower()
-    return APP_ALIASES.get(n, n)
 
-
-def open_app(name: str) -> bool:
-    key = normalize_app_name(name)
-    path = APP_PATHS.get(key)
-    if path and Path(path).exists():
-        os.startfile(path)  # nosec - local desktop automation
-        return True
-    return False
+def open_app(name: str, fuzzy: bool = True) -> Optional[str]:
+    """Launch an app by spoken name. Returns its display name, or None if not found."""
+    if current_session().remote:
+        # the client launches apps on its own machine
+        current_session().emit({"type": "open_app", "name": name})
+        return name
+    ent = _apps.lookup(name, fuzzy=fuzzy)
+    if ent and _apps.launch(ent):
+        return ent["name"]
+    return None
 # -------------------------------------------------------------
 
 
 # ----------------------------- Notes -----------------------------
 def add_note(text: str):
-    with open(NOTES_FILE, "a", encoding="utf-8") as f:
+    sess = current_session()
+    path = sess.notes_file if sess.remote else NOTES_FILE
+    with open(path, "a", encoding="utf-8") as f:
         f.write(text.strip() + "\n")
+    retrieval.refresh_async(notes=[path], docs_folder=None)
 # -----------------------------------------------------------------
 
 
 # ----------------------------- Timers ----------------------------
+# One scheduler thread for all timers (not one sleeping thread per timer)
+_timers: list = []           # heap of (due, seq, context, callback)
+_timer_cv = threading.Condition()
+_timer_seq = itertools.count()
+_timer_thread: Optional[threading.Thread] = None
+
+
+def _timer_loop():
+    while True:
+        with _timer_cv:
+            while not _timers or _timers[0][0] > time.monotonic():
+                _timer_cv.wait(_timers[0][0] - time.monotonic() if _timers else None)
+            _, _, ctx, fn = heapq.heappop(_timers)
+        try:
+            ctx.run(fn)
+        except Exception as e:
+            print("[timer error]", repr(e))
+
+
 def set_timer(seconds: int):
+    global _timer_thread
+
     def ding():
-        speak("Time's up.")
-    t = threading.Timer(seconds, ding)
-    t.daemon = True
-    t.start()
+        say("Time's up.")
+    # run in this session's context so the ding reaches the right client
+    ctx = contextvars.copy_context()
+    with _timer_cv:
+        heapq.heappush(_timers, (time.monotonic() + seconds, next(_timer_seq), ctx, ding))
+        if _timer_thread is None:
+            _timer_thread = threading.Thread(target=_timer_loop, name="timers", daemon=True)
+            _timer_thread.start()
+        _timer_cv.notify()
 # -----------------------------------------------------------------
 
 
-# Optional jokes
-try:
-    import pyjokes
-except Exception:
-    pyjokes = None
+# Optional jokes (imported on first joke, not at startup)
+def _pyjokes():
+    try:
+        import pyjokes
+        return pyjokes
+    except Exception:
+        return None
 
 
 def nrm(x: str) -> str:
@@ -82,13 +124,39 @@ def nrm(x: str) -> str:
 
 def say(msg: str):
     print(f"[say] {msg}")
-    speak(msg)
+    _speak(msg)
+
+
+def _speak(text: str, chunked: bool = True):
+    """Speak locally, or send the text to a remote session's client."""
+    sess = current_session()
+    if sess.remote:
+        sess.emit({"type": "text", "text": text})
+    else:
+        speak(text, chunked=chunked)
+
+
+def _open_url(url: str):
+    sess = current_session()
+    if sess.remote:
+        sess.emit({"type": "open_url", "url": url})
+    else:
+        webbrowser.open(url)
+
+
+def _talk_control(action: str):
+    """stop / pause / resume speech; remote clients control their own playback."""
+    sess = current_session()
+    if sess.remote:
+        sess.emit({"type": "control", "action": action})
+    else:
+        {"stop": stop_speaking, "pause": pause_speaking, "resume": resume_speaking}[action]()
 
 
 # -------------- Natural “thinking” (single cue) ---------------
 def quick_thinking_cue():
     """Say one natural cue instead of repeating fillers."""
-    speak("Hmm… let me think.", chunked=False)
+    _speak("Hmm… let me think.", chunked=False)
 # --------------------------------------------------------------
 
 
@@ -112,48 +180,75 @@ def open_site_or_search(text: str):
     if "." in rest and " " not in rest:
         url = rest if rest.startswith(("http://", "https://")) else "https://" + rest
         say(f"Opening {rest}")
-        webbrowser.open(url)
+        _open_url(url)
     else:
         say("Okay, searching.")
-        webbrowser.open(f"https://www.google.com/search?q={rest}")
+        _open_url(f"https://www.google.com/search?q={rest}")
+
 
+# Which section of _handle_question took the command (kept with recorded utterances)
+_intent: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("intent", default=None)
 
-def handle_question(text: str, player: MusicPlayer) -> str:
+
+def handle_question(text: str, player: MusicPlayer, sess: Optional[Session] = None) -> str:
     """
     Handle commands while ACTIVE.
     Return one of: "continue", "sleep", "exit"
+    `sess` routes output and state to a server client; default is the local desktop.
     """
-    cmd = nrm(text)
+    t0 = time.perf_counter()
+    token = activate(sess) if sess is not None else None
+    try:
+        return _handle_question(text, player)
+    finally:
+        if token is not None:
+            deactivate(token)
+        recorder.finish(intent=_intent.get(), handle_s=time.perf_counter() - t0)
+
+
+def _handle_question(text: str, player: MusicPlayer) -> str:
+    sess = current_session()
+    # Nepali commands are mapped onto the English ones below; local speech follows the language
+    cmd = nrm(apply_language(text, sess.lang, set_tts=not sess.remote))
     print(f"[handle] {cmd!r}")
 
     # -------- talk control --------
+    _intent.set("talk")
     if cmd.startswith("say "):
         say(cmd[4:].strip());                     return "continue"
     if cmd in {"stop talking", "stop speaking", "be quiet", "shut up"}:
-        stop_speaking();                          return "continue"
+        _talk_control("stop");                    return "continue"
     if cmd in {"wait", "pause speaking"}:
-        pause_speaking(); say("Okay, I will wait."); return "continue"
+        _talk_control("pause"); say("Okay, I will wait."); return "continue"
     if cmd in {"resume speaking", "continue speaking"}:
-        resume_speaking(); say("Resuming.");      return "continue"
+        _talk_control("resume"); say("Resuming."); return "continue"
 
     # -------- exit / sleep --------
+    _intent.set("session")
     if cmd in {"quit", "exit", "close", "shutdown"}:
         say("Goodbye!");                          return "exit"
     if cmd in {"go to sleep", "sleep", "stop listening"}:
         say("Going to sleep. Say prajwal to wake me."); return "sleep"
 
     # -------- help / time / date --------
+    _intent.set("info")
     if cmd in {"help", "what can you do", "commands"}:
         say_help();                                return "continue"
-    if "time" in cmd:
+    if re.search(r"\btime\b", cmd):   # whole word, so "set a timer ..." reaches the timer handler
         say(f"The time is {datetime.now().strftime('%I:%M %p')}");   return "continue"
     if "date" in cmd or "day" in cmd:
         say(f"Today is {datetime.now().strftime('%A, %B %d, %Y')}"); return "continue"
 
     # -------- voice control --------
+    _intent.set("voice")
     if cmd.startswith("change voice to "):
         target = cmd.replace("change voice to", "", 1).strip()
         chosen = None
+        if current_session().remote:
+            # the host's SAPI voice is shared; remote clients pick their own
+            current_session().voice = target
+            say(f"Okay, I’ll use the {target} voice.")
+            return "continue"
         if target in {"female", "girl", "woman"}:
             for pick in ("zira", "hazel", "aria", "jenny", "sara"):
                 chosen = set_voice(pick)
@@ -178,34 +273,35 @@ def handle_question(text: str, player: MusicPlayer) -> str:
         say("I listed your voices in the terminal.");                 return "continue"
 
     # -------- LOCAL APPS (priority) --------
-    for kw in APP_KEYWORDS:
-        if cmd.startswith(kw + " "):
-            app = cmd[len(kw):].strip()
-            if open_app(app):
-                say(f"Opening {normalize_app_name(app)}.")
-            else:
-                say("I couldn't find that app. You can add it to my list.")
-            return "continue"
+    _intent.set("app")
+    kw = next((k for k in APP_KEYWORDS if cmd.startswith(k + " ")), None)
+    if kw:
+        opened = open_app(cmd[len(kw):].strip())
+        if opened:
+            say(f"Opening {opened}.")
+        else:
+            say("I couldn't find that app. You can add it to my list.")
+        return "continue"
 
-    # Also catch "open vs code" (without the word 'app')
-    for app_key in APP_PATHS.keys():
-        if cmd.startswith("open " + app_key):
-            if open_app(app_key):
-                say(f"Opening {app_key}.")
-            else:
-                say("I couldn't find that app. You can add it to my list.")
+    # Also catch "open vs code" (without the word 'app'); exact names only so
+    # "open youtube" still goes to the web
+    if cmd.startswith("open ") and not cmd.startswith("open website "):
+        opened = open_app(cmd[5:].strip(), fuzzy=False) if not current_session().remote else None
+        if opened:
+            say(f"Opening {opened}.")
             return "continue"
 
     # -------- web / maps (tight matches so we don’t collide with 'who is ...') --------
+    _intent.set("web")
     if cmd.startswith("open website "):
         query = cmd.replace("open website", "", 1).strip()
         if "." in query and " " not in query:
             url = query if query.startswith(("http://", "https://")) else "https://" + query
             say(f"Opening {query}")
-            webbrowser.open(url)
+            _open_url(url)
         else:
             say("Okay, searching.")
-            webbrowser.open(f"https://www.google.com/search?q={query}")
+            _open_url(f"https://www.google.com/search?q={query}")
         return "continue"
 
     if cmd.startswith("open "):
@@ -215,7 +311,7 @@ def handle_question(text: str, player: MusicPlayer) -> str:
         place = cmd.replace("directions to", "", 1).strip()
         if place:
             say(f"Showing directions to {place}")
-            webbrowser.open(f"https://www.google.com/maps/dir/?api=1&destination={place}")
+            _open_url(f"https://www.google.com/maps/dir/?api=1&destination={place}")
         else:
             say("Where do you want to go?")
         return "continue"
@@ -224,23 +320,24 @@ def handle_question(text: str, player: MusicPlayer) -> str:
         place = cmd.replace("navigate to", "", 1).strip()
         if place:
             say(f"Navigating to {place}")
-            webbrowser.open(f"https://www.google.com/maps/dir/?api=1&destination={place}")
+            _open_url(f"https://www.google.com/maps/dir/?api=1&destination={place}")
         else:
             say("Where do you want to go?")
         return "continue"
 
     if "open youtube" in cmd:
-        say("Opening YouTube"); webbrowser.open("https://www.youtube.com"); return "continue"
+        say("Opening YouTube"); _open_url("https://www.youtube.com"); return "continue"
 
     if cmd.startswith("google ") or "search google for" in cmd:
         query = cmd.split("for", 1)[1].strip() if "for" in cmd else cmd.replace("google", "", 1).strip()
         if query:
-            say("Okay, searching."); webbrowser.open(f"https://www.google.com/search?q={query}")
+            say("Okay, searching."); _open_url(f"https://www.google.com/search?q={query}")
         else:
             say("What should I search for?")
         return "continue"
 
     # -------- music --------
+    _intent.set("music")
     if "play music" in cmd or "play song" in cmd:
         try:
             title = player.play(); say(f"Playing {title}")
@@ -259,6 +356,7 @@ def handle_question(text: str, player: MusicPlayer) -> str:
         player.stop(); say("Stopped");           return "continue"
 
     # -------- utilities: notes / timers --------
+    _intent.set("utility")
     if cmd.startswith("take a note ") or cmd.startswith("note "):
         # everything after the first space is the note
         parts = text.split(" ", 2)
@@ -271,7 +369,6 @@ def handle_question(text: str, player: MusicPlayer) -> str:
         return "continue"
 
     if cmd.startswith("set a timer for "):
-        import re
         m = re.search(r"(\d+)\s*(second|seconds|minute|minutes|min|mins)", cmd)
         if m:
             n = int(m.group(1))
@@ -283,6 +380,7 @@ def handle_question(text: str, player: MusicPlayer) -> str:
         return "continue"
 
     # -------- news (keep it short: only first headline) --------
+    _intent.set("news")
     if cmd.startswith("news about "):
         topic = cmd.replace("news about", "", 1).strip()
         say(f"Checking headlines about {topic}.")
@@ -293,7 +391,7 @@ def handle_question(text: str, player: MusicPlayer) -> str:
             say("I couldn't fetch the news right now.")
             return "continue"
         if headlines:
-            speak(headlines[0])
+            _speak(headlines[0])
         else:
             say(f"I couldn't find headlines about {topic}.")
         return "continue"
@@ -307,13 +405,15 @@ def handle_question(text: str, player: MusicPlayer) -> str:
             say("I couldn't fetch the news right now.")
             return "continue"
         if headlines:
-            speak(headlines[0])
+            _speak(headlines[0])
         else:
             say("No headlines found.")
         return "continue"
 
     # -------- jokes --------
+    _intent.set("joke")
     if "joke" in cmd or "make me laugh" in cmd:
+        pyjokes = _pyjokes()
         if pyjokes:
             try:
                 say(pyjokes.get_joke())
@@ -324,26 +424,49 @@ def handle_question(text: str, player: MusicPlayer) -> str:
         return "continue"
 
     # -------- default fallback → local AI (ONE short sentence) --------
+    _intent.set("ai")
     quick_thinking_cue()
 
+    system = "You are a helpful voice assistant. Reply in ONE short sentence."
+    try:
+        context = retrieval.context_for(cmd, RETRIEVAL_CHARS,
+                                        sources=[sess.notes_file if sess.remote else NOTES_FILE, DOCS_FOLDER])
+    except Exception as e:
+        print("[retrieval error]", repr(e))
+        context = ""
+    if context:
+        system += "\nUse these notes and documents from the user if they are relevant:\n" + context
+
     sentence = ""
     punct = {".", "!", "?", "…"}
-    for chunk in ask_ai_stream(
-        cmd,
-        system="You are a helpful voice assistant. Reply in ONE short sentence.",
-        max_tokens=60,
-    ):
-        sentence += chunk
-        if any(sentence.strip().endswith(p) for p in punct) or len(sentence) > 140:
-            speak(sentence.strip())
-            break
+    gate = sess.llm_gate   # server mode bounds concurrent LLM calls
+    with gate if gate is not None else nullcontext():
+        for chunk in ask_ai_routed(
+            cmd,
+            system=system,
+            max_tokens=60,
+        ):
+            sentence += chunk
+            if any(sentence.strip().endswith(p) for p in punct) or len(sentence) > 140:
+                _speak(sentence.strip())
+                break
     return "continue"
 
 
-def main():
-    say("I'm in standby. Say 'prajwal' to wake me.")
+def startup() -> MusicPlayer:
+    """Everything before the first wake-word listen; heavy work goes to the background."""
+    warm_models()
+    retrieval.refresh_async(notes=[NOTES_FILE])
+    _apps.refresh_async()
     player = MusicPlayer(MUSIC_FOLDER)
-    player.scan()
+    player.scan_async()
+    player.analyze_async()
+    say("I'm in standby. Say 'prajwal' to wake me.")
+    return player
+
+
+def main():
+    player = startup()
 
     active = False
     while True:
@@ -354,19 +477,18 @@ def main():
                 continue
             txt = nrm(heard)
             if any(ww in txt for ww in WAKE_WORDS):
+                recorder.finish(intent="wake")
                 active = True
                 # NOTE: no "I'm listening" TTS here
 
                 # Let the first command be long and natural:
                 #   - no phrase_time_limit (unlimited)
-                #   - stop when you pause ~1.8s (set in listener.py or override here)
+                #   - VAD ends short commands fast, waits longer mid-sentence (listener.py)
                 first_cmd = listen(
                     timeout=20,                 # wait up to 20s for you to start
                     phrase_time_limit=None,     # unlimited, ends on pause
-                    language="en-US",
+                    language=LANGUAGE,
                     debug=False,
-                    pause_threshold=1.8,        # override if you want
-                    non_speaking_duration=0.3
                 )
                 if first_cmd:
                     state = handle_question(first_cmd, player)
@@ -380,11 +502,9 @@ def main():
         # ACTIVE: keep taking long commands until you say "go to sleep"/"exit"
         cmd_text = listen(
             timeout=30,                 # wait up to 30s for you to start talking
-            phrase_time_limit=None,     # unlimited speech; ends when you pause ~1.8s
-            language="en-US",
+            phrase_time_limit=None,     # unlimited speech; ends when you pause
+            language=LANGUAGE,
             debug=False,
-            pause_threshold=1.8,
-            non_speaking_duration=0.3
         )
         if not cmd_text:
             # You didn't speak; stay active, don't re-wake
@@ -396,6 +516,10 @@ def main():
         elif state == "exit":
             break
 
+    rec = recorder.get()
+    if rec:
+        rec.close(timeout=5)   # write out utterances still queued
+
     # (The following code is unreachable and has been removed to fix syntax errors.)
 
 if __name__ == "__main__":
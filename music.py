@@ -1,63 +1,141 @@
 from __future__ import annotations
 import os
-from typing import List
-import pygame
-from pygame import mixer
+import threading
+from typing import List, Optional
 from dataclasses import dataclass
 from pathlib import Path
 
 SUPPORTED = (".mp3", ".wav", ".ogg", ".flac")
+MUSIC_VOLUME = 1.0    # base volume; per-track loudness gain is applied on top
+
+
+def _mixer():
+    """Import pygame and start only its mixer, on first use (not every pygame subsystem)."""
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    from pygame import mixer
+    if not mixer.get_init():
+        mixer.init()
+    return mixer
+
+
+def _set_gain(track: "Track", res: dict) -> None:
+    import loudness
+    track.lufs, track.peak_db = res["lufs"], res["peak_db"]
+    # mixer volume can only attenuate, so quiet tracks play at MUSIC_VOLUME
+    track.gain_db = min(0.0, loudness.gain_db(res["lufs"], res["peak_db"]))
+
 
 @dataclass
 class Track:
     path: Path
     title: str
+    lufs: Optional[float] = None      # integrated loudness, filled in by analyze_async()
+    peak_db: Optional[float] = None
+    gain_db: float = 0.0
 
 class MusicPlayer:
     def __init__(self, music_folder: str):
         self.music_folder = Path(music_folder)
         self.playlist: List[Track] = []
         self.index = 0
-        pygame.init()
-        mixer.init()
+        self._scanned = threading.Event()
+        self._scan_lock = threading.Lock()
+        self._cache = None
 
     def scan(self) -> int:
-        self.playlist.clear()
+        with self._scan_lock:
+            return self._scan()
+
+    def scan_async(self) -> threading.Thread:
+        """Scan the library in the background; playback waits for it if needed."""
+        t = threading.Thread(target=self.scan, name="music-scan", daemon=True)
+        t.start()
+        return t
+
+    def analyze_async(self) -> threading.Thread:
+        """Measure loudness of new/changed tracks on a process pool, in the background."""
+        def _run():
+            import loudness
+            self._ensure_scanned()
+            cache = self._loudness_cache()
+            by_path = {t.path: t for t in self.playlist}
+
+            def _apply(path: Path, res: dict) -> None:
+                t = by_path.get(path)
+                if t:
+                    _set_gain(t, res)
+            try:
+                n = loudness.analyze_all(list(by_path), cache, on_result=_apply)
+                if n:
+                    print(f"[music] analysed loudness of {n} track(s)")
+            except Exception as e:
+                print(f"[music] loudness analysis failed: {e!r}")
+        t = threading.Thread(target=_run, name="music-loudness", daemon=True)
+        t.start()
+        return t
+
+    def _loudness_cache(self):
+        if self._cache is None:
+            import loudness
+            self._cache = loudness.LoudnessCache()
+        return self._cache
+
+    def _ensure_scanned(self) -> None:
+        if not self._scanned.is_set():
+            with self._scan_lock:
+                if not self._scanned.is_set():   # a background scan may have just finished
+                    self._scan()
+
+    def _scan(self) -> int:
         if not self.music_folder.exists():
             self.music_folder.mkdir(parents=True, exist_ok=True)
 
+        tracks = []
+        cache = self._loudness_cache()
         for p in sorted(self.music_folder.rglob("*")):
             if p.suffix.lower() in SUPPORTED and p.is_file():
-                self.playlist.append(Track(p, p.stem))
+                t = Track(p, p.stem)
+                res = cache.get(p)
+                if res:
+                    _set_gain(t, res)
+                tracks.append(t)
+        self.playlist = tracks
+        self._scanned.set()
         return len(self.playlist)
 
     def _load_current(self) -> None:
+        self._ensure_scanned()
         if not self.playlist:
             raise RuntimeError("Playlist is empty. Put some audio files in your music folder.")
         track = self.playlist[self.index]
-        mixer.music.load(track.path.as_posix())
+        _mixer().music.load(track.path.as_posix())
 
     def play(self) -> str:
         self._load_current()
-        mixer.music.play()
+        m = _mixer()
+        m.music.play()
+        # after play(): some pygame versions reset the volume on play
+        m.music.set_volume(min(1.0, MUSIC_VOLUME * 10 ** (self.playlist[self.index].gain_db / 20)))
         return self.current_title()
 
     def pause(self) -> None:
-        mixer.music.pause()
+        _mixer().music.pause()
 
     def resume(self) -> None:
-        mixer.music.unpause()
+        _mixer().music.unpause()
 
     def stop(self) -> None:
-        mixer.music.stop()
+        _mixer().music.stop()
 
     def next(self) -> str:
+        self._ensure_scanned()
         if not self.playlist:
             return "No tracks"
         self.index = (self.index + 1) % len(self.playlist)
         return self.play()
 
     def prev(self) -> str:
+        self._ensure_scanned()
         if not self.playlist:
             return "No tracks"
         self.index = (self.index - 1) % len(self.playlist)
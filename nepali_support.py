@@ -50,3 +50,16 @@ def switch_language(txt: str) -> str:
         CURRENT_LANG = "en-US"
         set_lang("en-US")
         return txt
+
+def apply_language(txt: str, lang: str, set_tts: bool = True) -> str:
+    """
+    Like switch_language, but trusts the language the recogniser identified
+    (e.g. 'ne-NP' from Whisper) and only falls back to scanning for Devanagari.
+    set_tts=False leaves the global CURRENT_LANG / TTS language alone (server sessions).
+    """
+    global CURRENT_LANG
+    nepali = lang.startswith("ne") or is_nepali_text(txt)
+    if set_tts:
+        CURRENT_LANG = "ne-NP" if nepali else "en-US"
+        set_lang(CURRENT_LANG)
+    return normalize_nepali_command(txt) if nepali else txt
@@ -1,10 +1,19 @@
 # news.py
 from __future__ import annotations
-import requests
 from typing import List
 from config import NEWS_API_KEY
 
 _BASE = "https://newsapi.org/v2/top-headlines"
+_http = None   # one pooled session, reused across requests
+
+
+def _session():
+    global _http
+    if _http is None:
+        import requests  # imported on first use to keep startup fast
+        _http = requests.Session()
+    return _http
+
 
 def get_headlines(topic: str | None = None, country: str = "us", limit: int = 5) -> List[str]:
     if not NEWS_API_KEY or NEWS_API_KEY.strip() in {"", "YOUR_NEWSAPI_KEY_HERE"}:
@@ -15,7 +24,7 @@ def get_headlines(topic: str | None = None, country: str = "us", limit: int = 5)
         params["q"] = topic
 
     try:
-        r = requests.get(_BASE, params=params, timeout=12)
+        r = _session().get(_BASE, params=params, timeout=12)
     except Exception as e:
         raise RuntimeError(f"Network error calling NewsAPI: {e!r}")
     if r.status_code != 200:
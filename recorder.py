@@ -0,0 +1,272 @@
+# recorder.py — opt-in utterance recorder for replay / tuning corpora
+#
+# When RECORD_UTTERANCES is on, every captured utterance is kept with its
+# transcript, the intent handle_question chose and per-stage timings. The voice
+# path only drops a record on a bounded queue (never blocks; drops when full);
+# a background thread compresses it to FLAC (speech_recognition's bundled
+# encoder, zlib'd PCM if that can't run) and appends it to segment files:
+#
+#   RECORDINGS_DIR/seg-000001.bin        compressed audio blobs, back to back
+#   RECORDINGS_DIR/seg-000001.idx        one JSON line per blob (offset, length, metadata)
+#   RECORDINGS_DIR/labels.jsonl          transcripts a person confirmed or corrected
+#
+# A segment is closed at SEGMENT_BYTES; the oldest segments are deleted once the
+# corpus passes MAX_BYTES. iter_corpus() streams it back for benchmarks. The
+# recorded transcript is whatever STT won, so accuracy measurements must use
+# Utterance.reference (set only from labels.jsonl, see stt_tune.py --label).
+# The audio is what the VAD kept, i.e. already endpointed; with RECORD_POST_ROLL
+# set, the raw capture (Utterance.raw) is stored instead for endpointing corpora.
+from __future__ import annotations
+import contextvars
+import io
+import json
+import queue
+import subprocess
+import threading
+import time
+import wave
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+import speech_recognition as sr
+
+from config import RECORD_UTTERANCES, RECORDINGS_DIR
+
+SEGMENT_BYTES = 16 * 2**20   # start a new segment after this much audio
+MAX_BYTES = 512 * 2**20      # keep at most this much (oldest segments go first)
+QUEUE_SIZE = 64              # utterances waiting for the writer before new ones are dropped
+LABELS_FILE = "labels.jsonl"
+
+
+@dataclass
+class Utterance:
+    """One recorded utterance; the audio is read from its segment on demand."""
+    time: float
+    transcript: Optional[str]
+    intent: Optional[str]
+    timings: Dict[str, float]
+    rate: int
+    width: int
+    codec: str
+    segment: Path
+    offset: int
+    length: int
+    reference: Optional[str] = None   # confirmed / corrected transcript, if labelled
+    raw: bool = False                  # uncut capture (calibration + lead-in + post-roll)
+
+    @property
+    def key(self) -> str:
+        return f"{self.segment.name}:{self.offset}"
+
+    def data(self) -> bytes:
+        with open(self.segment, "rb") as f:
+            f.seek(self.offset)
+            return f.read(self.length)
+
+    def audio(self) -> sr.AudioData:
+        blob = self.data()
+        if self.codec == "flac":
+            from speech_recognition.audio import get_flac_converter
+            wav = subprocess.run([get_flac_converter(), "--decode", "--stdout", "--totally-silent", "-"],
+                                 input=blob, stdout=subprocess.PIPE, check=True).stdout
+            with wave.open(io.BytesIO(wav)) as w:
+                pcm = w.readframes(w.getnframes())
+        else:
+            pcm = zlib.decompress(blob)
+        return sr.AudioData(pcm, self.rate, self.width)
+
+
+@dataclass
+class _Record:
+    audio: sr.AudioData
+    transcript: Optional[str]
+    intent: Optional[str] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+    time: float = field(default_factory=time.time)
+    raw: bool = False
+
+
+def _encode(audio: sr.AudioData) -> tuple[str, bytes, int]:
+    """(codec, blob, sample width). FLAC needs ≤ 24-bit samples."""
+    try:
+        return "flac", audio.get_flac_data(convert_width=min(audio.sample_width, 3)), min(audio.sample_width, 3)
+    except Exception:
+        return "pcm-zlib", zlib.compress(audio.frame_data, 6), audio.sample_width
+
+
+class Recorder:
+    def __init__(self, root: str = RECORDINGS_DIR, segment_bytes: int = SEGMENT_BYTES,
+                 max_bytes: int = MAX_BYTES, queue_size: int = QUEUE_SIZE):
+        self.root = Path(root)
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.written = 0
+        self.dropped = 0
+        self._q: "queue.Queue[Optional[_Record]]" = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name="recorder", daemon=True)
+        self._thread.start()
+
+    # -------- voice path --------
+    def submit(self, audio: sr.AudioData, transcript: Optional[str], intent: Optional[str] = None,
+               timings: Optional[Dict[str, float]] = None) -> bool:
+        """Queue one utterance for writing. Never blocks; returns False if it was dropped."""
+        return self._put(_Record(audio, transcript, intent, dict(timings or {})))
+
+    def _put(self, rec: _Record) -> bool:
+        try:
+            self._q.put_nowait(rec)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Write what's queued, then stop the writer."""
+        self._q.put(None)
+        self._thread.join(timeout)
+
+    # -------- writer thread --------
+    def _segments(self) -> list[Path]:
+        return sorted(self.root.glob("seg-*.bin"))
+
+    def _current(self) -> Path:
+        segs = self._segments()
+        if segs and segs[-1].stat().st_size < self.segment_bytes:
+            return segs[-1]
+        n = int(segs[-1].stem.split("-")[1]) + 1 if segs else 1
+        return self.root / f"seg-{n:06d}.bin"
+
+    def _enforce_retention(self, keep: Path) -> None:
+        segs = self._segments()
+        total = sum(p.stat().st_size for p in segs)
+        for p in segs:
+            if total <= self.max_bytes or p == keep:
+                break
+            total -= p.stat().st_size
+            p.unlink()
+            p.with_suffix(".idx").unlink(missing_ok=True)
+
+    def _write(self, rec: _Record) -> None:
+        codec, blob, width = _encode(rec.audio)
+        seg = self._current()
+        # blob first, index line second: a crash leaves an unindexed tail, never a bad entry
+        with open(seg, "ab") as f:
+            offset = f.tell()
+            f.write(blob)
+        meta = {"t": round(rec.time, 3), "o": offset, "n": len(blob), "c": codec,
+                "r": rec.audio.sample_rate, "w": width, "text": rec.transcript,
+                "intent": rec.intent, "ms": {k: round(v * 1000, 1) for k, v in rec.timings.items()},
+                "raw": rec.raw}
+        with open(seg.with_suffix(".idx"), "a", encoding="utf-8") as f:
+            f.write(json.dumps(meta, ensure_ascii=False) + "\n")
+        self.written += 1
+        self._enforce_retention(keep=seg)
+
+    def _run(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        while True:
+            rec = self._q.get()
+            if rec is None:
+                return
+            try:
+                self._write(rec)
+            except Exception as e:
+                print(f"[recorder] write failed: {e!r}")
+
+
+def load_labels(root: str = RECORDINGS_DIR) -> Dict[str, str]:
+    """Utterance.key → reference transcript (later lines win)."""
+    out: Dict[str, str] = {}
+    try:
+        with open(Path(root) / LABELS_FILE, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    m = json.loads(line)
+                    out[m["key"]] = m["text"]
+                except (ValueError, KeyError):
+                    continue
+    except OSError:
+        pass
+    return out
+
+
+def save_label(utt: Utterance, text: str, root: str = RECORDINGS_DIR) -> None:
+    """Record the transcript a person confirmed or corrected for utt."""
+    with open(Path(root) / LABELS_FILE, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"key": utt.key, "text": text}, ensure_ascii=False) + "\n")
+    utt.reference = text
+
+
+def iter_corpus(root: str = RECORDINGS_DIR) -> Iterator[Utterance]:
+    """Recorded utterances, oldest first."""
+    labels = load_labels(root)
+    for idx in sorted(Path(root).glob("seg-*.idx")):
+        seg = idx.with_suffix(".bin")
+        try:
+            size = seg.stat().st_size
+            lines = idx.read_text(encoding="utf-8").splitlines()
+        except FileNotFoundError:
+            continue   # deleted by retention while we were reading
+        for line in lines:
+            try:
+                m = json.loads(line)
+            except ValueError:
+                continue   # torn last line
+            if m["o"] + m["n"] > size:
+                continue
+            yield Utterance(time=m["t"], transcript=m["text"], intent=m["intent"],
+                            timings={k: v / 1000 for k, v in m["ms"].items()},
+                            rate=m["r"], width=m["w"], codec=m["c"],
+                            segment=seg, offset=m["o"], length=m["n"],
+                            reference=labels.get(f"{seg.name}:{m['o']}"), raw=m.get("raw", False))
+
+
+# ------------------------ Voice-path hooks ------------------------
+# listener_race.listen() calls begin() with the audio it captured; handle_question()
+# calls finish() with the intent it chose; listener.capture() hands over the uncut
+# capture with note_raw() when RECORD_POST_ROLL is set. An utterance that never reaches
+# handle_question (wake-word listens, nothing recognised) is written with intent None
+# when the next one begins.
+_recorder: Optional[Recorder] = None
+_recorder_lock = threading.Lock()
+_pending: contextvars.ContextVar[Optional[_Record]] = contextvars.ContextVar("pending_utterance",
+                                                                              default=None)
+_raw: contextvars.ContextVar[Optional[sr.AudioData]] = contextvars.ContextVar("raw_capture",
+                                                                              default=None)
+
+
+def get() -> Optional[Recorder]:
+    """The shared recorder, or None when RECORD_UTTERANCES is off."""
+    global _recorder
+    if not RECORD_UTTERANCES:
+        return None
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = Recorder()
+        return _recorder
+
+
+def note_raw(audio: sr.AudioData) -> None:
+    """Store this uncut capture instead of the endpointed audio begin() is given."""
+    _raw.set(audio)
+
+
+def begin(audio: sr.AudioData, transcript: Optional[str], **timings: float) -> None:
+    if get() is None:
+        return
+    finish()
+    raw = _raw.get()
+    _raw.set(None)
+    _pending.set(_Record(raw or audio, transcript, timings=timings, raw=raw is not None))
+
+
+def finish(intent: Optional[str] = None, **timings: float) -> None:
+    rec = _pending.get()
+    if rec is None:
+        return
+    _pending.set(None)
+    rec.intent = intent
+    rec.timings.update(timings)
+    get()._put(rec)
@@ -0,0 +1,343 @@
+# retrieval.py — local notes/documents index so the AI fallback can answer from your own data
+#
+# Files are split into chunks and embedded as hashed word / word-pair / char-trigram
+# vectors (no model download). Vectors live in a memory-mapped float32 matrix that
+# only grows: changed files have their old rows tombstoned and new rows appended,
+# and the matrix is compacted when too much of it is dead. Query terms are
+# IDF-weighted from per-bucket document frequencies, so words like "the"/"note"
+# don't dominate. Top-k over 100k chunks is one mat-vec (a few ms).
+from __future__ import annotations
+import json
+import os
+import re
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from config import DOCS_FOLDER, INDEX_DIR
+
+DIM = 256
+CHUNK_CHARS = 400          # document chunk size
+CHUNK_OVERLAP = 80
+MIN_SCORE = 0.12           # ignore weak matches
+TEXT_SUFFIXES = (".txt", ".md")
+COMPACT_DEAD_RATIO = 0.5
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_STOP = frozenset(
+    "a an the and or of to in on at for is are was were be it this that what which who "
+    "me my i you your do did does about with from as by so".split()
+)
+
+
+def _features(text: str) -> List[str]:
+    words = [w for w in _WORD.findall(text.lower()) if w not in _STOP]
+    feats = list(words)
+    feats += [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for w in words:
+        padded = f" {w} "
+        feats += [padded[i:i + 3] for i in range(len(padded) - 2)]
+    return feats
+
+
+def embed(text: str) -> np.ndarray:
+    """Signed feature-hashing embedding, L2-normalised (float32[DIM])."""
+    feats = _features(text)
+    if not feats:
+        return np.zeros(DIM, dtype=np.float32)
+    h = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in feats), dtype=np.uint32, count=len(feats))
+    sign = np.where(h & 0x80000000, -1.0, 1.0)
+    v = np.bincount((h % DIM).astype(np.intp), weights=sign, minlength=DIM).astype(np.float32)
+    n = np.linalg.norm(v)
+    return v / n if n else v
+
+
+def chunk_text(text: str, is_notes: bool = False) -> List[str]:
+    """Notes are one per line; documents are split into overlapping windows on paragraph breaks."""
+    if is_notes:
+        return [ln.strip() for ln in text.splitlines() if ln.strip()]
+    out: List[str] = []
+    for para in re.split(r"\n\s*\n", text):
+        para = " ".join(para.split())
+        start = 0
+        while start < len(para):
+            out.append(para[start:start + CHUNK_CHARS])
+            if start + CHUNK_CHARS >= len(para):
+                break
+            start += CHUNK_CHARS - CHUNK_OVERLAP
+    return out
+
+
+class Index:
+    """Incrementally updated on-disk chunk index."""
+
+    def __init__(self, root: str = INDEX_DIR):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._vec_path = self.root / "vectors.f32"
+        self._chunks_path = self.root / "chunks.jsonl"
+        self._manifest_path = self.root / "manifest.json"
+        self._lock = threading.RLock()
+        self._load()
+
+    # -------- persistence --------
+    def _load(self) -> None:
+        m = {}
+        if self._manifest_path.exists():
+            try:
+                m = json.loads(self._manifest_path.read_text(encoding="utf-8"))
+            except Exception:
+                m = {}
+        if m.get("dim") != DIM:
+            m = {}   # different embedding → rebuild
+        self.rows: int = m.get("rows", 0)
+        self.files: Dict[str, dict] = m.get("files", {})
+        self.df = np.zeros(DIM, dtype=np.float64)
+        if m.get("df"):
+            self.df[:] = m["df"]
+        self.texts: List[str] = []
+        self.sources: List[str] = []
+        if self.rows and self._chunks_path.exists():
+            try:
+                with open(self._chunks_path, encoding="utf-8") as f:
+                    for line in f:
+                        rec = json.loads(line)
+                        self.texts.append(rec["t"])
+                        self.sources.append(rec["s"])
+            except (ValueError, KeyError):
+                self.texts = []   # torn line
+        if not self.rows or len(self.texts) != self.rows:
+            # new / reset manifest or torn write: drop data files too, or
+            # new rows would be appended after stale ones
+            self.rows, self.files, self.texts, self.sources = 0, {}, [], []
+            self.df[:] = 0
+            for p in (self._chunks_path, self._vec_path):
+                p.unlink(missing_ok=True)
+        self.alive = np.zeros(self.rows, dtype=bool)
+        for info in self.files.values():
+            self.alive[info["rows"][0]:info["rows"][1]] = True
+        self._open_vectors(max(self.rows, 1024))
+
+    def _open_vectors(self, capacity: int) -> None:
+        nbytes = capacity * DIM * 4
+        if not self._vec_path.exists() or self._vec_path.stat().st_size < nbytes:
+            with open(self._vec_path, "ab") as f:
+                f.truncate(nbytes)
+        self.capacity = self._vec_path.stat().st_size // (DIM * 4)
+        self.vecs = np.memmap(self._vec_path, dtype=np.float32, mode="r+", shape=(self.capacity, DIM))
+
+    def _save_manifest(self) -> None:
+        self.vecs.flush()
+        tmp = self._manifest_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"dim": DIM, "rows": self.rows, "files": self.files,
+                                   "df": self.df.tolist()}), encoding="utf-8")
+        os.replace(tmp, self._manifest_path)
+
+    # -------- updates --------
+    def _append(self, source: str, chunks: List[str]) -> Tuple[int, int]:
+        start = self.rows
+        if not chunks:
+            return start, start
+        need = start + len(chunks)
+        if need > self.capacity:
+            del self.vecs
+            self._open_vectors(max(need, self.capacity * 2))
+        block = np.stack([embed(c) for c in chunks])
+        self.vecs[start:need] = block
+        self.df += (block != 0).sum(axis=0)
+        with open(self._chunks_path, "a", encoding="utf-8") as f:
+            for c in chunks:
+                f.write(json.dumps({"s": source, "t": c}, ensure_ascii=False) + "\n")
+        self.texts += chunks
+        self.sources += [source] * len(chunks)
+        self.rows = need
+        self.alive = np.concatenate([self.alive, np.ones(len(chunks), dtype=bool)])
+        return start, need
+
+    def _drop(self, source: str) -> None:
+        info = self.files.pop(source, None)
+        if info:
+            a, b = info["rows"]
+            self.alive[a:b] = False
+            self.df -= (np.asarray(self.vecs[a:b]) != 0).sum(axis=0)
+
+    def update_file(self, path: Path, is_notes: bool = False, save: bool = True) -> bool:
+        """Re-index one file if its mtime/size changed. Returns True if it did."""
+        key = path.resolve().as_posix()
+        with self._lock:
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                if key in self.files:
+                    self._drop(key)
+                    if save:
+                        self._save_manifest()
+                    return True
+                return False
+            old = self.files.get(key)
+            if old and old["mtime"] == st.st_mtime and old["size"] == st.st_size:
+                return False
+            text = path.read_text(encoding="utf-8", errors="ignore")
+            self._drop(key)
+            a, b = self._append(key, chunk_text(text, is_notes=is_notes))
+            self.files[key] = {"mtime": st.st_mtime, "size": st.st_size, "rows": [a, b]}
+            self._maybe_compact()
+            if save:
+                self._save_manifest()
+            return True
+
+    def refresh(self, notes: Iterable[str] = (), docs_folder: Optional[str] = DOCS_FOLDER) -> int:
+        """Index new/changed notes files and documents; forget files that were deleted."""
+        changed = 0
+        seen = set()
+        for n in notes:
+            p = Path(n)
+            seen.add(p.resolve().as_posix())
+            changed += self.update_file(p, is_notes=True, save=False)
+        if docs_folder and Path(docs_folder).exists():
+            for p in sorted(Path(docs_folder).rglob("*")):
+                if p.suffix.lower() in TEXT_SUFFIXES and p.is_file():
+                    seen.add(p.resolve().as_posix())
+                    changed += self.update_file(p, save=False)
+        with self._lock:
+            for key in [k for k in self.files if k not in seen and not Path(k).exists()]:
+                self._drop(key)
+                changed += 1
+            if changed:
+                self._save_manifest()
+        return changed
+
+    def _maybe_compact(self) -> None:
+        dead = self.rows - int(self.alive.sum())
+        if self.rows < 1024 or dead < COMPACT_DEAD_RATIO * self.rows:
+            return
+        keep = np.nonzero(self.alive)[0]
+        vecs = np.array(self.vecs[keep])
+        texts = [self.texts[i] for i in keep]
+        sources = [self.sources[i] for i in keep]
+        # each live file is a contiguous run of alive rows; shift it down past the dead ones
+        before = np.concatenate([[0], np.cumsum(self.alive)])
+        for info in self.files.values():
+            a, b = info["rows"]
+            info["rows"] = [int(before[a]), int(before[b])]
+        self.vecs[: len(keep)] = vecs
+        with open(self._chunks_path, "w", encoding="utf-8") as f:
+            for s, t in zip(sources, texts):
+                f.write(json.dumps({"s": s, "t": t}, ensure_ascii=False) + "\n")
+        self.texts, self.sources, self.rows = texts, sources, len(keep)
+        self.alive = np.ones(self.rows, dtype=bool)
+
+    # -------- search --------
+    def search(self, query: str, k: int = 3,
+               sources: Optional[Iterable[str]] = None) -> List[Tuple[float, str, str]]:
+        """Top-k (score, source, text). `sources` limits results to those files/folders."""
+        with self._lock:
+            if not self.rows:
+                return []
+            n = len(self.texts)
+            idf = np.log((n + 1) / (self.df + 1)).astype(np.float32)
+            q = embed(query) * idf
+            qn = np.linalg.norm(q)
+            if not qn:
+                return []
+            scores = self.vecs[:self.rows] @ (q / qn)
+            mask = self.alive.copy()
+            if sources is not None:
+                allowed = np.zeros(self.rows, dtype=bool)
+                prefixes = tuple(Path(s).resolve().as_posix() for s in sources)
+                for key, info in self.files.items():
+                    if key.startswith(prefixes):
+                        allowed[info["rows"][0]:info["rows"][1]] = True
+                mask &= allowed
+            scores = np.where(mask, scores, -1.0)
+            k = min(k, self.rows)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(float(scores[i]), self.sources[i], self.texts[i])
+                    for i in top if scores[i] >= MIN_SCORE]
+
+
+# ------------------------ Shared index ------------------------
+_index: Optional[Index] = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> Index:
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = Index()
+        return _index
+
+
+_pending_notes: set = set()
+_pending_docs: Optional[str] = None
+_worker: Optional[threading.Thread] = None
+_pending_lock = threading.Lock()
+
+
+def _refresh_worker() -> None:
+    global _worker, _pending_docs
+    while True:
+        with _pending_lock:
+            notes, docs = list(_pending_notes), _pending_docs
+            _pending_notes.clear()
+            _pending_docs = None
+            if not notes and docs is None:
+                _worker = None
+                return
+        try:
+            n = get_index().refresh(notes=notes, docs_folder=docs)
+            if n:
+                print(f"[retrieval] re-indexed {n} file(s)")
+        except Exception as e:
+            print(f"[retrieval] refresh failed: {e!r}")
+
+
+def refresh_async(notes: Iterable[str] = (), docs_folder: Optional[str] = DOCS_FOLDER) -> None:
+    """
+    Bring the index up to date in the background (docs_folder=None: just these notes).
+    Requests that arrive while a refresh runs are merged into the next pass.
+    """
+    global _worker, _pending_docs
+    with _pending_lock:
+        _pending_notes.update(notes)
+        if docs_folder:
+            _pending_docs = docs_folder
+        if _worker is None:
+            _worker = threading.Thread(target=_refresh_worker, name="retrieval-refresh", daemon=True)
+            _worker.start()
+
+
+def context_for(query: str, max_chars: int, sources: Optional[Iterable[str]] = None,
+                k: int = 4) -> str:
+    """Best passages for `query`, as bullet lines, trimmed to `max_chars`."""
+    out, used = [], 0
+    for score, src, text in get_index().search(query, k=k, sources=sources):
+        line = f"- ({Path(src).name}) {text}"
+        if used + len(line) > max_chars:
+            break
+        out.append(line)
+        used += len(line) + 1
+    return "\n".join(out)
+
+
+# Quick self-check: python retrieval.py
+if __name__ == "__main__":
+    import tempfile
+    with tempfile.TemporaryDirectory() as d:
+        docs, note = Path(d, "docs"), Path(d, "notes.txt")
+        docs.mkdir()
+        (docs / "moon.md").write_text("The moon orbits the earth every 27 days.", encoding="utf-8")
+        note.write_text("buy milk\n", encoding="utf-8")
+        ix = Index(str(Path(d, "index")))
+        ix.refresh(notes=[str(note)], docs_folder=str(docs))
+        rows = ix.rows
+        note.write_text("buy milk\ncall mum\n", encoding="utf-8")
+        ix.refresh(notes=[str(note)], docs_folder=None)   # notes only, like add_note
+        ix = Index(str(Path(d, "index")))
+        assert ix.rows > rows and any("moon" in t for t in ix.texts), "notes-only refresh lost documents"
+        print(f"ok: {ix.rows} rows after a notes-only refresh and reload")
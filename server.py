@@ -0,0 +1,284 @@
+# server.py — headless multi-session mode: handle_question over HTTP
+#
+# Usage:  python server.py [--host 127.0.0.1] [--port 8765]
+#
+#   POST   /session               {"user": "kitchen", "lang": "auto"}   → {"session": "<id>"}
+#   POST   /turn?session=<id>     {"text": "play music"} or an audio/wav body
+#                                 → streamed NDJSON events, one per line:
+#                                   {"type": "transcript" | "text" | "open_url" | "music" | ...}
+#                                   ... {"type": "done", "state": "continue", "ms": 12.3}
+#   DELETE /session?session=<id>
+#   GET    /health
+#
+# Every client gets its own Session (music position, notes file, language,
+# voice). Nothing is spoken, played or opened on the host: the events tell the
+# client what to do. STT and LLM work go through bounded pools so a burst of
+# clients queues instead of starting hundreds of decodes at once.
+from __future__ import annotations
+import argparse
+import io
+import json
+import re
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+from config import MUSIC_FOLDER
+from music import MusicPlayer
+from session import Session
+
+# ------------------------ Settings ------------------------
+STT_WORKERS = 4          # concurrent speech recognitions
+LLM_WORKERS = 2          # concurrent local-AI answers (Ollama serialises anyway)
+MAX_SESSIONS = 1000
+SESSION_TTL = 30 * 60    # drop sessions idle this long (seconds)
+NOTES_DIR = "notes"      # one notes file per user
+# ----------------------------------------------------------
+
+
+class HeadlessPlayer(MusicPlayer):
+    """Per-session playlist position; the client does the actual playback."""
+
+    def __init__(self, library: MusicPlayer, sess: Session):
+        super().__init__(library.music_folder.as_posix())
+        self.library = library
+        self.sess = sess
+
+    def _scan(self) -> int:
+        self.library._ensure_scanned()
+        self.playlist = list(self.library.playlist)
+        self._scanned.set()
+        return len(self.playlist)
+
+    def _music_event(self, action: str) -> None:
+        ev = {"type": "music", "action": action}
+        if action == "play" and self.playlist:
+            track = self.playlist[self.index]
+            ev.update(title=track.title, path=track.path.as_posix())
+        self.sess.emit(ev)
+
+    def play(self) -> str:
+        self._ensure_scanned()
+        if not self.playlist:
+            raise RuntimeError("Playlist is empty. Put some audio files in your music folder.")
+        self._music_event("play")
+        return self.current_title()
+
+    def pause(self) -> None:
+        self._music_event("pause")
+
+    def resume(self) -> None:
+        self._music_event("resume")
+
+    def stop(self) -> None:
+        self._music_event("stop")
+
+
+class SessionManager:
+    def __init__(self, library: MusicPlayer, llm_gate: threading.Semaphore):
+        self.library = library
+        self.llm_gate = llm_gate
+        self._sessions: Dict[str, Session] = {}
+        self._lock = threading.Lock()
+
+    def create(self, user: Optional[str] = None, lang: str = "en-US") -> Session:
+        with self._lock:
+            if len(self._sessions) >= MAX_SESSIONS:
+                raise RuntimeError("too many sessions")
+            auto = lang == "auto"   # identify per utterance; sess.lang caches the result
+            sess = Session(remote=True, lang="en-US" if auto else lang, lang_auto=auto,
+                           llm_gate=self.llm_gate)
+            safe = re.sub(r"[^A-Za-z0-9_-]", "_", user or sess.id)[:64]
+            sess.notes_file = str(Path(NOTES_DIR) / f"{safe}.txt")
+            sess.player = HeadlessPlayer(self.library, sess)
+            self._sessions[sess.id] = sess
+            return sess
+
+    def get(self, sid: str) -> Optional[Session]:
+        with self._lock:
+            return self._sessions.get(sid or "")
+
+    def drop(self, sid: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(sid, None) is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def reap(self) -> int:
+        cutoff = time.time() - SESSION_TTL
+        with self._lock:
+            stale = [sid for sid, s in self._sessions.items() if s.last_seen < cutoff]
+            for sid in stale:
+                del self._sessions[sid]
+        return len(stale)
+
+
+def _recognize_wav(body: bytes, sess: Session) -> Optional[str]:
+    import speech_recognition as sr
+    import listener_race
+    with sr.AudioFile(io.BytesIO(body)) as src:
+        audio = sr.Recognizer().record(src)
+    lang = listener_race.AUTO if sess.lang_auto else sess.lang
+    return listener_race.recognize(audio, language=lang, sess=sess)
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive + chunked streaming
+    sessions: SessionManager
+    stt_pool: ThreadPoolExecutor
+
+    def setup(self):
+        super().setup()
+        # events are small and must go out as they happen, not after delayed ACKs
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, fmt, *args):   # quiet; the load test makes a lot of requests
+        pass
+
+    # -------- helpers --------
+    def _json(self, code: int, obj: dict) -> None:
+        data = json.dumps(obj).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> bytes:
+        n = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(n) if n else b""
+
+    def _query(self) -> tuple[str, dict]:
+        u = urlparse(self.path)
+        return u.path, {k: v[0] for k, v in parse_qs(u.query).items()}
+
+    # -------- routes --------
+    def do_GET(self):
+        path, _ = self._query()
+        if path == "/health":
+            self._json(200, {"ok": True, "sessions": len(self.sessions)})
+        else:
+            self._json(404, {"error": "not found"})
+
+    def do_DELETE(self):
+        path, q = self._query()
+        if path == "/session":
+            self._json(200, {"dropped": self.sessions.drop(q.get("session", ""))})
+        else:
+            self._json(404, {"error": "not found"})
+
+    def do_POST(self):
+        path, q = self._query()
+        body = self._body()
+        if path == "/session":
+            try:
+                args = json.loads(body or b"{}")
+                sess = self.sessions.create(user=args.get("user"), lang=args.get("lang", "en-US"))
+            except Exception as e:
+                self._json(503, {"error": str(e)})
+                return
+            self._json(200, {"session": sess.id})
+        elif path == "/turn":
+            sess = self.sessions.get(q.get("session", ""))
+            if sess is None:
+                self._json(404, {"error": "unknown session"})
+                return
+            self._turn(sess, body)
+        else:
+            self._json(404, {"error": "not found"})
+
+    def _turn(self, sess: Session, body: bytes) -> None:
+        from main import handle_question
+
+        t0 = time.perf_counter()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        broken = False
+
+        def write(ev: dict) -> None:
+            nonlocal broken
+            if broken:
+                return
+            data = (json.dumps(ev, ensure_ascii=False) + "\n").encode("utf-8")
+            try:
+                self.wfile.write(b"%X\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+            except OSError:
+                broken = True   # client went away; finish the turn quietly
+
+        state = "continue"
+        # while attached, every event goes through sess.emit (under sess._lock) so a
+        # timer thread's emit can't interleave chunk frames with ours
+        with sess.turn_lock:   # turns within one session stay in order
+            sess.attach(write)
+            try:
+                ctype = (self.headers.get("Content-Type") or "").split(";")[0].strip()
+                if ctype.startswith("audio/"):
+                    text = self.stt_pool.submit(_recognize_wav, body, sess).result()
+                    sess.emit({"type": "transcript", "text": text, "lang": sess.lang})
+                else:
+                    text = json.loads(body or b"{}").get("text")
+                if text:
+                    state = handle_question(text, sess.player, sess)
+            except Exception as e:
+                sess.emit({"type": "error", "error": repr(e)})
+            finally:
+                sess.detach()
+        # detached: timer events now queue in the outbox, so writing directly is safe
+        write({"type": "done", "state": state, "ms": round((time.perf_counter() - t0) * 1000, 1)})
+        if state == "exit":
+            self.sessions.drop(sess.id)
+        if not broken:
+            try:
+                self.wfile.write(b"0\r\n\r\n")
+            except OSError:
+                pass
+
+
+class _Server(ThreadingHTTPServer):
+    request_queue_size = 1024   # room for hundreds of clients connecting at once
+    daemon_threads = True
+
+
+def make_server(host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    library = MusicPlayer(MUSIC_FOLDER)
+    library.scan_async()
+    Path(NOTES_DIR).mkdir(parents=True, exist_ok=True)
+
+    Handler.sessions = SessionManager(library, threading.BoundedSemaphore(LLM_WORKERS))
+    Handler.stt_pool = ThreadPoolExecutor(max_workers=STT_WORKERS, thread_name_prefix="server-stt")
+
+    srv = _Server((host, port), Handler)
+
+    def _reaper():
+        while True:
+            time.sleep(60)
+            Handler.sessions.reap()
+    threading.Thread(target=_reaper, name="session-reaper", daemon=True).start()
+    return srv
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    args = ap.parse_args()
+    srv = make_server(args.host, args.port)
+    print(f"[server] listening on http://{args.host}:{args.port}")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[server] bye")
+
+
+if __name__ == "__main__":
+    main()
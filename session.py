@@ -0,0 +1,71 @@
+# session.py — per-conversation state for handle_question
+#
+# The desktop loop uses one implicit local session (speaks through tts, opens
+# the browser, writes notes.txt). server.py creates one Session per client;
+# those have an event sink instead, so nothing touches the host's speakers,
+# browser or shared files.
+from __future__ import annotations
+import contextvars
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional
+
+Event = dict
+
+
+@dataclass
+class Session:
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    player: Any = None
+    notes_file: str = "notes.txt"
+    lang: str = "en-US"
+    lang_auto: bool = False                           # identify the language of each utterance
+    lang_at: float = 0.0                              # when lang was last identified from speech (0 = never)
+    voice: Optional[str] = None
+    remote: bool = False                              # False = local desktop session
+    llm_gate: Optional[threading.Semaphore] = None    # bounds concurrent LLM calls
+    created: float = field(default_factory=time.time)
+    last_seen: float = field(default_factory=time.time)
+    turn_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    _sink: Optional[Callable[[Event], None]] = field(default=None, repr=False)
+    _outbox: List[Event] = field(default_factory=list, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def emit(self, event: Event) -> None:
+        """Send an event to the client's open turn, or queue it for the next one (e.g. timers)."""
+        with self._lock:
+            if self._sink is not None:
+                self._sink(event)
+            else:
+                self._outbox.append(event)
+
+    def attach(self, sink: Callable[[Event], None]) -> None:
+        """Route events to `sink` for the duration of a turn, flushing anything queued."""
+        with self._lock:
+            self._sink = sink
+            queued, self._outbox = self._outbox, []
+            for ev in queued:
+                sink(ev)
+        self.last_seen = time.time()
+
+    def detach(self) -> None:
+        with self._lock:
+            self._sink = None
+
+
+LOCAL = Session(id="local")
+_CURRENT: contextvars.ContextVar[Session] = contextvars.ContextVar("session", default=LOCAL)
+
+
+def current() -> Session:
+    return _CURRENT.get()
+
+
+def activate(sess: Session) -> contextvars.Token:
+    return _CURRENT.set(sess)
+
+
+def deactivate(token: contextvars.Token) -> None:
+    _CURRENT.reset(token)
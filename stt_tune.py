@@ -0,0 +1,262 @@
+# stt_tune.py — pick the Whisper model / compute type / threads / beam size for this machine
+#
+# Usage:  python stt_tune.py [corpus] [--target 1.5] [--sizes tiny,base,small]
+#                            [--compute int8,int8_float32,float32] [--threads 2,4]
+#                            [--beams 1,3] [--language en] [--dry-run]
+#         python stt_tune.py --label [corpus]
+#
+# corpus: a folder of <name>.wav + <name>.txt (reference transcript) pairs, or a
+# recorder.py corpus. Defaults to ./stt_samples, then RECORDINGS_DIR. A recorded
+# transcript is only what the winning STT heard, so scoring against it would
+# favour whatever config made the recordings; only utterances confirmed or
+# corrected with --label (which plays each clip and asks) are used.
+#
+# Every configuration runs in a fresh process through listener_whisper.decode_pcm,
+# so the numbers are what the assistant would see, and peak memory is per config.
+# Reported per config: real-time factor (decode time / audio time), p50/p90
+# latency per utterance, word error rate and peak RSS. The most accurate config
+# whose p90 latency is within --target is written to listener_whisper.TUNE_FILE,
+# which listener_whisper loads at startup.
+from __future__ import annotations
+import argparse
+import itertools
+import json
+import multiprocessing as mp
+import os
+import platform
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+from config import RECORDINGS_DIR
+
+SAMPLES_DIR = "./stt_samples"
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+# ------------------------ Corpus ------------------------
+def load_samples(root: Path) -> List[tuple[bytes, float, str]]:
+    """(16 kHz int16 PCM, seconds, reference text) for every usable clip under root."""
+    import speech_recognition as sr
+    import listener_whisper
+    out = []
+    for wav in sorted(root.rglob("*.wav")):
+        ref = wav.with_suffix(".txt")
+        if not ref.exists():
+            continue
+        with sr.AudioFile(str(wav)) as src:
+            audio = sr.Recognizer().record(src)
+        out.append((listener_whisper.to_pcm16k(audio), ref.read_text(encoding="utf-8").strip()))
+    if not out:
+        import recorder
+        for u in recorder.iter_corpus(str(root)):
+            if u.reference:
+                out.append((listener_whisper.to_pcm16k(u.audio()), u.reference))
+    return [(pcm, len(pcm) / (2 * listener_whisper.WHISPER_RATE), ref) for pcm, ref in out]
+
+
+def wer(ref: str, hyp: str) -> tuple[int, int]:
+    """(word edits, reference words) — case and punctuation are ignored."""
+    r = _WORD.findall(ref.lower())
+    h = _WORD.findall(hyp.lower())
+    d = np.arange(len(h) + 1)
+    for i, rw in enumerate(r, 1):
+        prev, d[0] = d[0], i
+        for j, hw in enumerate(h, 1):
+            cur = min(d[j] + 1, d[j - 1] + 1, prev + (rw != hw))
+            prev, d[j] = d[j], cur
+    return int(d[len(h)]), len(r)
+
+
+def _play(audio) -> None:
+    try:
+        import io
+        import pygame
+        if not pygame.mixer.get_init():
+            pygame.mixer.init()
+        snd = pygame.mixer.Sound(file=io.BytesIO(audio.get_wav_data()))
+        snd.play()
+        time.sleep(snd.get_length())
+    except Exception as e:
+        print(f"  (can't play audio: {e!r})")
+
+
+def label(root: Path) -> None:
+    """Play each unlabelled recording and ask for its true transcript."""
+    import recorder
+    todo = [u for u in recorder.iter_corpus(str(root)) if u.reference is None]
+    print(f"{len(todo)} unlabelled utterances. Enter = heard correctly, or type what was said; "
+          f"/r replay, /s skip, /q quit\n")
+    done = 0
+    for u in todo:
+        audio = u.audio()
+        while True:
+            _play(audio)
+            ans = input(f"  heard: {u.transcript or '(nothing)'}\n  > ").strip()
+            if ans != "/r":
+                break
+        if ans == "/q":
+            break
+        if ans == "/s" or not (ans or u.transcript):
+            continue
+        recorder.save_label(u, ans or u.transcript, str(root))
+        done += 1
+    print(f"labelled {done}")
+
+
+# ------------------------ One configuration ------------------------
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if platform.system() == "Darwin" else peak / 1024   # bytes vs KiB
+    except ImportError:
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / 2**20
+        except Exception:
+            return None
+
+
+def run_config(cfg: dict, samples: List[tuple[bytes, float, str]], language: Optional[str]) -> dict:
+    """Load the model as configured and decode every sample. Runs in its own process."""
+    import listener_whisper as lw
+    lw.USE_TUNING = False
+    lw.SERVICE_WORKERS = 0
+    lw._PREFERRED, lw._BACKEND = cfg["backend"], None
+    lw.MODEL_SIZE, lw.DEVICE = cfg["model"], cfg["device"]
+    lw.COMPUTE_TYPE, lw.CPU_THREADS, lw.BEAM_SIZE = cfg["compute_type"], cfg["cpu_threads"], cfg["beam_size"]
+
+    t0 = time.perf_counter()
+    lw.preload()
+    load_s = time.perf_counter() - t0
+    lw.decode_pcm(samples[0][0], language=language)   # first decode pays one-off setup
+
+    lat, edits, words, audio_s = [], 0, 0, 0.0
+    for pcm, secs, ref in samples:
+        t0 = time.perf_counter()
+        res = lw.decode_pcm(pcm, language=language)
+        lat.append(time.perf_counter() - t0)
+        e, n = wer(ref, res[0] if res else "")
+        edits, words, audio_s = edits + e, words + n, audio_s + secs
+    lat.sort()
+    return dict(cfg, rtf=sum(lat) / audio_s, p50_s=lat[len(lat) // 2],
+                p90_s=lat[min(len(lat) - 1, int(0.9 * len(lat)))],
+                wer=edits / max(1, words), peak_rss_mb=_peak_rss_mb(), load_s=load_s)
+
+
+# ------------------------ Search ------------------------
+def _compute_types(device: str, wanted: List[str]) -> List[str]:
+    """Drop compute types this machine's CTranslate2 build can't run."""
+    try:
+        import ctranslate2
+        ok = ctranslate2.get_supported_compute_types(device)
+        return [c for c in wanted if c in ok]
+    except Exception:
+        return wanted
+
+
+def grid(backend: str, device: str, sizes, computes, threads, beams) -> List[dict]:
+    if backend == "whisper":
+        computes = ["float16" if device == "cuda" else "float32"]   # openai-whisper has no int8
+    else:
+        computes = _compute_types(device, computes)
+    return [{"backend": backend, "model": m, "device": device, "compute_type": c,
+             "cpu_threads": t, "beam_size": b}
+            for m, c, t, b in itertools.product(sizes, computes, threads, beams)]
+
+
+def choose(results: List[dict], target: float) -> tuple[Optional[dict], bool]:
+    """Most accurate config within the latency target (then fastest, then smallest); else the fastest."""
+    fits = [r for r in results if r["p90_s"] <= target]
+    if fits:
+        # timing noise shouldn't decide between equals: then prefer the smaller footprint
+        return min(fits, key=lambda r: (round(r["wer"], 3), round(r["p90_s"], 2),
+                                        r["peak_rss_mb"] or 0.0)), True
+    return (min(results, key=lambda r: r["p90_s"]) if results else None), False
+
+
+def main() -> None:
+    cpus = os.cpu_count() or 1
+    ap = argparse.ArgumentParser()
+    ap.add_argument("corpus", nargs="?", type=Path)
+    ap.add_argument("--target", type=float, default=1.5, help="p90 seconds per utterance")
+    ap.add_argument("--sizes", default="tiny,base,small")
+    ap.add_argument("--compute", default="int8,int8_float32,float32")
+    ap.add_argument("--threads", default=",".join(str(t) for t in sorted({max(1, cpus // 2), cpus})))
+    ap.add_argument("--beams", default="1,3")
+    ap.add_argument("--device", default="cpu")
+    ap.add_argument("--language", default="en", help='"auto" = language ID on every clip')
+    ap.add_argument("--dry-run", action="store_true", help="print results, don't save")
+    ap.add_argument("--label", action="store_true", help="confirm/correct recorded transcripts")
+    args = ap.parse_args()
+
+    if args.label:
+        label(args.corpus or Path(RECORDINGS_DIR))
+        return
+    import listener_whisper
+    listener_whisper._PREFERRED = None   # tune on the default backend, not the last tuned one
+    listener_whisper._BACKEND = None
+    backend = listener_whisper._backend()
+    if backend == "none":
+        raise SystemExit("Needs faster-whisper or openai-whisper")
+    corpus = args.corpus or next((Path(p) for p in (SAMPLES_DIR, RECORDINGS_DIR) if Path(p).exists()), None)
+    samples = load_samples(corpus) if corpus else []
+    if not samples:
+        raise SystemExit(f"No labelled samples: put <name>.wav + <name>.txt pairs in {SAMPLES_DIR}, "
+                         f"or record with RECORD_UTTERANCES = True and run --label")
+    language = None if args.language == "auto" else args.language
+
+    configs = grid(backend, args.device, args.sizes.split(","), args.compute.split(","),
+                   [int(t) for t in args.threads.split(",")], [int(b) for b in args.beams.split(",")])
+    print(f"{len(samples)} clips ({sum(s[1] for s in samples):.0f}s of audio), "
+          f"{len(configs)} configs, backend={backend}, target p90 ≤ {args.target:.2f}s\n")
+    print(f"{'model':>8s} {'compute':>13s} {'thr':>4s} {'beam':>4s} {'RTF':>6s} {'p50 s':>6s} "
+          f"{'p90 s':>6s} {'WER':>6s} {'RSS MB':>7s}")
+
+    results = []
+    ctx = mp.get_context("spawn")
+    for cfg in configs:
+        # fresh process per config: clean model load and a true per-config peak RSS
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            try:
+                r = pool.submit(run_config, cfg, samples, language).result()
+            except Exception as e:
+                print(f"{cfg['model']:>8s} {cfg['compute_type']:>13s} failed: {e!r}")
+                continue
+        results.append(r)
+        rss = f"{r['peak_rss_mb']:7.0f}" if r["peak_rss_mb"] is not None else f"{'?':>7s}"
+        print(f"{r['model']:>8s} {r['compute_type']:>13s} {r['cpu_threads']:4d} {r['beam_size']:4d} "
+              f"{r['rtf']:6.2f} {r['p50_s']:6.2f} {r['p90_s']:6.2f} {r['wer']:6.1%} {rss}", flush=True)
+
+    best, fits = choose(results, args.target)
+    if best is None:
+        raise SystemExit("No configuration could be run")
+    if not fits:
+        print(f"\nNothing meets p90 ≤ {args.target:.2f}s; taking the fastest.")
+    print(f"\nbest: {best['model']} {best['compute_type']} threads={best['cpu_threads']} "
+          f"beam={best['beam_size']}  p90={best['p90_s']:.2f}s  WER={best['wer']:.1%}")
+    if args.dry_run:
+        return
+    keys = ("backend", "model", "device", "compute_type", "cpu_threads", "beam_size")
+    out = {
+        "config": {k: best[k] for k in keys},
+        "metrics": {k: best[k] for k in ("rtf", "p50_s", "p90_s", "wer", "peak_rss_mb", "load_s")},
+        "target_p90_s": args.target, "met_target": fits, "clips": len(samples),
+        "host": {"machine": platform.machine(), "processor": platform.processor(), "cpus": cpus},
+        "tuned_at": datetime.now().isoformat(timespec="seconds"),
+        "results": results,
+    }
+    path = Path(listener_whisper.TUNE_FILE)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(out, indent=2), encoding="utf-8")
+    print(f"saved → {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,48 @@
 # tts.py — Windows SAPI-only TTS with stop/wait/resume
+import atexit
+import collections
 import threading
 import time
 import re
+import types
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional
 
-try:
-    import win32com.client  # requires pywin32
-except Exception as e:
-    raise RuntimeError(
-        "win32com is missing. Install pywin32:\n  pip install pywin32"
-    ) from e
-
-# SAPI engine (synchronous)
-_sapi = win32com.client.Dispatch("SAPI.SpVoice")
+# SAPI engine (synchronous), created on first use so importing tts is cheap
+# and doesn't fail off Windows
+_sapi = None
+_sapi_error: Optional[str] = None
 
 _STOP = threading.Event()
 _PAUSE = threading.Event()
 _LOCK = threading.RLock()  # serialize voice access
+_OUT_LOCK = threading.Lock()  # one speak() plays at a time
+
+# Pipelined synthesis: each chunk is rendered to PCM in memory (SAPI memory
+# stream) on a worker thread while the previous one plays through a single
+# PyAudio output stream, so the pause between sentences no longer includes
+# SAPI start-up. Falls back to plain Speak() if PyAudio or memory streams fail.
+PIPELINED = True
+RATE = 22050                 # SAPI SAFT22kHz16BitMono
+_SAFT22kHz16BitMono = 22
+BLOCK_S = 0.1                # playback granularity: stop/pause act within this
+SENTENCE_GAP_S = 0.15        # silence kept between chunks (SAPI's own padding is trimmed)
+SILENCE_LEVEL = 200          # |sample| at or below this counts as silence when trimming
+
+_voice_desc: Optional[str] = None       # voice picked with set_voice (preferred for its language)
+_pipeline_error: Optional[str] = None
+_render_pool: Optional[ThreadPoolExecutor] = None
+_render_local = threading.local()
+_pa = None                              # PyAudio instance + output stream, opened once per process
+_out = None
+_gaps: List[float] = []                 # last speak(): seconds playback waited for each next chunk
 
 
 _current_lang = "en-US"   # default
+# SAPI voice tokens list their languages as hex LCIDs ("409" = en-US, "461" = ne-NP)
+_LCIDS = {"en": "409", "ne": "461"}
+_sapi_sel = types.SimpleNamespace(sel=None)   # which (language, voice) _sapi is set to
+_sel_missing: set = set()       # languages already reported as having no voice
 
 def set_lang(lang_code: str):
     """Set the current language for speech output (e.g. 'en-US' or 'ne-NP')."""
@@ -27,8 +50,56 @@ def set_lang(lang_code: str):
     _current_lang = lang_code
 
 
+def _select_voice(voice, state) -> None:
+    """
+    Point a SAPI voice at one that speaks _current_lang, preferring the set_voice
+    choice; if none is installed, keep the set_voice choice (or the default).
+    state remembers the last selection so this only enumerates on a change.
+    """
+    key = (_current_lang, _voice_desc)
+    if getattr(state, "sel", None) == key:
+        return
+    state.sel = key
+    lcid = _LCIDS.get(_current_lang.split("-")[0].lower())
+    toks = voice.GetVoices()
+    match = chosen = None
+    for i in range(toks.Count):
+        tok = toks.Item(i)
+        desc = tok.GetDescription()
+        try:
+            langs = tok.GetAttribute("Language").lower().split(";")
+        except Exception:
+            langs = []
+        if lcid in langs and (match is None or desc == _voice_desc):
+            match = tok
+        if desc == _voice_desc:
+            chosen = tok
+    if match is None and _current_lang not in _sel_missing:
+        _sel_missing.add(_current_lang)
+        print(f"[tts] no installed SAPI voice for {_current_lang}")
+    tok = match or chosen
+    if tok is not None:
+        voice.Voice = tok
+
+
+def _engine():
+    """Return the SAPI voice, creating it on first call; None if SAPI is unavailable."""
+    global _sapi, _sapi_error
+    with _LOCK:
+        if _sapi is None and _sapi_error is None:
+            try:
+                import win32com.client  # requires pywin32
+                _sapi = win32com.client.Dispatch("SAPI.SpVoice")
+            except Exception as e:
+                _sapi_error = repr(e)
+                print(f"[tts] SAPI unavailable, speech disabled (install pywin32 on Windows): {_sapi_error}")
+        return _sapi
+
+
 def list_voices() -> List[str]:
     """Return available voice descriptions."""
+    if _engine() is None:
+        return []
     toks = _sapi.GetVoices()
     out = []
     for i in range(toks.Count):
@@ -41,24 +112,31 @@ def set_voice(name_contains: Optional[str] = None) -> Optional[str]:
     """Select voice whose description contains substring (case-insensitive)."""
     if not name_contains:
         return None
+    if _engine() is None:
+        return None
+    global _voice_desc
     target = name_contains.lower()
     toks = _sapi.GetVoices()
     for i in range(toks.Count):
         desc = toks.Item(i).GetDescription()
         if target in desc.lower():
             _sapi.Voice = toks.Item(i)
+            _voice_desc = desc
             return desc
     return None
 
 
 def stop_speaking():
-    """Stop after the current chunk—SAPI can’t interrupt a running Speak, so we chunk small."""
+    """
+    Stop speaking. Pipelined: within BLOCK_S. Otherwise after the current chunk
+    (SAPI can’t interrupt a running Speak, so we chunk small).
+    """
     _STOP.set()
     # no direct hard-stop API; we finish current chunk and then stop
 
 
 def pause_speaking():
-    """Pause: stop after current chunk and wait until resume."""
+    """Pause (pipelined: mid-sentence, resumes where it left off) and wait until resume."""
     _PAUSE.set()
     _STOP.set()  # forces current chunk to end, then loop will wait
 
@@ -91,12 +169,160 @@ def _chunks(text: str):
     return merged or [text.strip()]
 
 
-def speak(text: str, chunked: bool = True):
-    """Speak text using SAPI. If chunked, split to short chunks."""
-    if not text:
-        return
-    parts = _chunks(text) if chunked else [text]
-    _STOP.clear()
+# ------------------------ Pipelined synthesis ------------------------
+def _render_voice():
+    """This worker thread's own SAPI voice (COM objects stay on the thread that made them)."""
+    v = getattr(_render_local, "voice", None)
+    if v is None:
+        import pythoncom
+        import win32com.client
+        pythoncom.CoInitialize()
+        v = _render_local.voice = win32com.client.Dispatch("SAPI.SpVoice")
+    _select_voice(v, _render_local)
+    return v
+
+
+def _trim(pcm: bytes) -> bytes:
+    """Cut SAPI's leading/trailing silence down to half a SENTENCE_GAP_S on each side."""
+    import numpy as np
+    x = np.frombuffer(pcm, dtype="<i2")
+    loud = np.flatnonzero(np.abs(x.astype(np.int32)) > SILENCE_LEVEL)
+    if not len(loud):
+        return b""
+    pad = int(SENTENCE_GAP_S * RATE / 2)
+    return x[max(0, loud[0] - pad): loud[-1] + pad].tobytes()
+
+
+def render(text: str, trim: bool = True) -> bytes:
+    """Synthesize text to 22.05 kHz 16-bit mono PCM in memory (no audio device involved)."""
+    import win32com.client
+    voice = _render_voice()
+    stream = win32com.client.Dispatch("SAPI.SpMemoryStream")
+    fmt = stream.Format
+    fmt.Type = _SAFT22kHz16BitMono
+    stream.Format = fmt
+    voice.AudioOutputStream = stream
+    voice.Speak(text)
+    pcm = bytes(stream.GetData())
+    return _trim(pcm) if trim else pcm
+
+
+def _renderer() -> ThreadPoolExecutor:
+    global _render_pool
+    with _LOCK:
+        if _render_pool is None:
+            _render_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts-render")
+        return _render_pool
+
+
+def _play(out, pcm: bytes) -> bool:
+    """Write one buffer in BLOCK_S blocks. False if stopped."""
+    step = int(BLOCK_S * RATE) * 2
+    for i in range(0, len(pcm), step):
+        while _PAUSE.is_set():   # the stream just runs dry while paused
+            time.sleep(0.05)
+        if _STOP.is_set():
+            return False
+        out.write(pcm[i:i + step])
+    return True
+
+
+def _output():
+    """The shared output stream, started. PortAudio init and device enumeration happen once."""
+    global _pa, _out
+    import pyaudio
+    with _LOCK:
+        if _pa is None:
+            _pa = pyaudio.PyAudio()
+        if _out is None:
+            _out = _pa.open(format=pyaudio.paInt16, channels=1, rate=RATE, output=True)
+        elif _out.is_stopped():
+            _out.start_stream()
+        return _out
+
+
+def _drop_output() -> None:
+    """Close the stream (after an error, so the next speak() reopens it)."""
+    global _out
+    with _LOCK:
+        if _out is not None:
+            try:
+                _out.close()
+            except Exception:
+                pass
+            _out = None
+
+
+@atexit.register
+def _close_output() -> None:
+    global _pa
+    _drop_output()
+    with _LOCK:
+        if _pa is not None:
+            _pa.terminate()
+            _pa = None
+
+
+def _speak_pipelined(parts: List[str]) -> int:
+    """
+    Render chunk n+1 while chunk n plays. Returns how many parts are done with
+    (all of them, unless rendering or playback failed part-way: the caller
+    speaks the rest). Setup errors (no PyAudio, no memory stream, no output
+    device) are raised before anything plays.
+    """
+    pool = _renderer()
+    todo = iter(parts)
+    pending: collections.deque = collections.deque()
+
+    def refill():
+        while len(pending) < 2:   # the playing buffer + the next one
+            p = next(todo, None)
+            if p is None:
+                return
+            pending.append(pool.submit(render, p))
+
+    refill()
+    first = pending.popleft().result()   # render errors surface here → caller falls back
+    try:
+        out = _output()
+    except Exception:
+        for f in pending:
+            f.cancel()
+        raise
+    _gaps.clear()
+    played = 0
+    try:
+        pcm = first
+        while True:
+            refill()
+            if not _play(out, pcm):
+                played = len(parts)   # stopped
+                break
+            played += 1
+            if not pending:
+                break
+            t0 = time.perf_counter()
+            pcm = pending.popleft().result()
+            _gaps.append(time.perf_counter() - t0)
+        out.stop_stream()   # drains what's buffered (≤ BLOCK_S after a stop); kept open for next time
+        return len(parts)
+    except Exception as e:
+        print(f"[tts] pipelined playback failed after {played}/{len(parts)} chunks: {e!r}")
+        _drop_output()
+        return played
+    finally:
+        for f in pending:
+            f.cancel()
+
+
+def last_gaps() -> List[float]:
+    """Seconds the last pipelined speak() waited for each next chunk (0 = it was ready)."""
+    return list(_gaps)
+
+
+def _speak_sync(parts: List[str]) -> None:
+    with _LOCK:
+        _select_voice(_sapi, _sapi_sel)
     for p in parts:
         # wait if paused
         while _PAUSE.is_set():
@@ -108,3 +334,21 @@ def speak(text: str, chunked: bool = True):
             _sapi.Speak(p)
         if _STOP.is_set():
             break
+
+
+def speak(text: str, chunked: bool = True):
+    """Speak text using SAPI. If chunked, split to short chunks."""
+    global _pipeline_error
+    if not text or _engine() is None:
+        return
+    parts = _chunks(text) if chunked else [text]
+    with _OUT_LOCK:
+        _STOP.clear()
+        done = 0
+        if PIPELINED and _pipeline_error is None:
+            try:
+                done = _speak_pipelined(parts)
+            except Exception as e:
+                _pipeline_error = repr(e)
+                print(f"[tts] pipelined speech unavailable, using SAPI directly: {_pipeline_error}")
+        _speak_sync(parts[done:])
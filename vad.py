@@ -0,0 +1,195 @@
+# vad.py — frame-level voice activity detection + adaptive endpointing (NumPy)
+from __future__ import annotations
+import collections
+import time
+from typing import Deque, Optional
+
+import numpy as np
+import speech_recognition as sr
+
+SAMPLE_RATE = 16000
+FRAME_MS = 20              # 10–30 ms frames
+
+# Detector tuning
+MARGIN_DB = 9.0            # frame must be this far above the noise floor
+MIN_BAND_RATIO = 0.3       # share of energy in the 200–4000 Hz speech band (rejects hum)
+MAX_FLATNESS = 0.55        # spectral flatness; white-ish noise is close to 1
+NOISE_ADAPT = 0.05         # how fast the noise floor follows non-speech frames
+
+# Endpointing tuning (seconds)
+START_FRAMES = 3           # consecutive speech frames needed to start (60 ms)
+PRE_ROLL = 0.3             # audio kept from before the start
+MIN_HANGOVER = 0.35        # trailing silence that ends a short command
+MAX_HANGOVER = 1.0         # trailing silence that ends a long sentence
+SHORT_UTTERANCE = 1.0      # speech up to this long counts as a short command
+LONG_UTTERANCE = 3.0       # speech this long or more gets MAX_HANGOVER
+
+
+def pcm_to_float(frame: bytes, sample_width: int = 2) -> np.ndarray:
+    """int16 little-endian PCM → float32 in [-1, 1]."""
+    if sample_width != 2:
+        raise ValueError("vad expects 16-bit PCM")
+    return np.frombuffer(frame, dtype="<i2").astype(np.float32) / 32768.0
+
+
+class FrameVAD:
+    """Energy + spectral-shape speech detector with an adaptive noise floor."""
+
+    def __init__(self, rate: int = SAMPLE_RATE, frame_ms: int = FRAME_MS):
+        self.rate = rate
+        self.frame_len = int(rate * frame_ms / 1000)
+        self.noise_db: Optional[float] = None
+        self._window = np.hanning(self.frame_len).astype(np.float32)
+        freqs = np.fft.rfftfreq(self.frame_len, 1.0 / rate)
+        self._band = (freqs >= 200) & (freqs <= 4000)
+
+    def features(self, x: np.ndarray) -> tuple[float, float, float]:
+        """(energy dB, speech-band energy ratio, spectral flatness) of one frame."""
+        energy_db = 10.0 * np.log10(np.mean(x * x) + 1e-10)
+        power = np.abs(np.fft.rfft(x * self._window)) ** 2 + 1e-12
+        band_ratio = float(power[self._band].sum() / power.sum())
+        flatness = float(np.exp(np.mean(np.log(power))) / np.mean(power))
+        return float(energy_db), band_ratio, flatness
+
+    def calibrate(self, x: np.ndarray) -> None:
+        """Seed the noise floor from a stretch of (assumed) silence."""
+        n = len(x) // self.frame_len
+        if n:
+            frames = x[: n * self.frame_len].reshape(n, self.frame_len)
+            self.noise_db = float(np.median(10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)))
+
+    def is_speech(self, x: np.ndarray) -> bool:
+        energy_db, band_ratio, flatness = self.features(x)
+        if self.noise_db is None:
+            self.noise_db = energy_db
+        speech = (energy_db > self.noise_db + MARGIN_DB
+                  and band_ratio >= MIN_BAND_RATIO
+                  and flatness <= MAX_FLATNESS)
+        if not speech:
+            # drop fast to quieter floors, rise slowly with steady background noise
+            if energy_db < self.noise_db:
+                self.noise_db = energy_db
+            else:
+                self.noise_db += NOISE_ADAPT * (energy_db - self.noise_db)
+        return speech
+
+
+class Endpointer:
+    """
+    Feed fixed-size frames; reports when an utterance starts and ends.
+    Hangover grows with utterance length: short commands end fast,
+    long sentences tolerate mid-sentence pauses.
+    """
+
+    def __init__(self, vad: FrameVAD, max_hangover: float = MAX_HANGOVER):
+        self.vad = vad
+        self.frame_s = vad.frame_len / vad.rate
+        self.max_hangover = max(MIN_HANGOVER, max_hangover)
+        self.started = False
+        self.speech_s = 0.0
+        self.silence_s = 0.0
+        self._run = 0
+
+    def hangover(self) -> float:
+        if self.speech_s <= SHORT_UTTERANCE:
+            return MIN_HANGOVER
+        k = min(1.0, (self.speech_s - SHORT_UTTERANCE) / (LONG_UTTERANCE - SHORT_UTTERANCE))
+        return MIN_HANGOVER + k * (self.max_hangover - MIN_HANGOVER)
+
+    def push(self, x: np.ndarray) -> str:
+        """Returns "silence", "start", "speech" or "end"."""
+        speech = self.vad.is_speech(x)
+        if not self.started:
+            self._run = self._run + 1 if speech else 0
+            if self._run >= START_FRAMES:
+                self.started = True
+                self.speech_s = self._run * self.frame_s
+                return "start"
+            return "silence"
+        if speech:
+            self.speech_s += self.frame_s + self.silence_s
+            self.silence_s = 0.0
+            return "speech"
+        self.silence_s += self.frame_s
+        return "end" if self.silence_s >= self.hangover() else "speech"
+
+
+def record(source: sr.Microphone, timeout: float | None = None,
+           phrase_time_limit: float | None = None,
+           max_hangover: float = MAX_HANGOVER,
+           calibration: float = 0.0,
+           raw_out: Optional[list] = None, post_roll: float = 0.0) -> sr.AudioData:
+    """
+    Read one utterance from an open sr.Microphone using frame-level VAD.
+    Raises sr.WaitTimeoutError like Recognizer.listen when nobody speaks.
+    If raw_out is a list, every frame read (including calibration and post_roll
+    seconds after the cut) is appended to it.
+    """
+    vad = FrameVAD(rate=source.SAMPLE_RATE)
+    ep = Endpointer(vad, max_hangover=max_hangover)
+    frame_bytes = vad.frame_len * source.SAMPLE_WIDTH
+
+    def frames():
+        buf = b""
+        while True:
+            buf += source.stream.read(source.CHUNK)
+            while len(buf) >= frame_bytes:
+                if raw_out is not None:
+                    raw_out.append(buf[:frame_bytes])
+                yield buf[:frame_bytes]
+                buf = buf[frame_bytes:]
+
+    it = frames()
+    if calibration > 0:
+        n = max(1, int(calibration / ep.frame_s))
+        vad.calibrate(pcm_to_float(b"".join(next(it) for _ in range(n)), source.SAMPLE_WIDTH))
+
+    pre: Deque[bytes] = collections.deque(maxlen=max(1, int(PRE_ROLL / ep.frame_s)))
+    voiced: list[bytes] = []
+    waited = 0.0
+    for frame in it:
+        state = ep.push(pcm_to_float(frame, source.SAMPLE_WIDTH))
+        if not ep.started:
+            pre.append(frame)
+            waited += ep.frame_s
+            if timeout and waited > timeout:
+                raise sr.WaitTimeoutError("listening timed out while waiting for phrase to start")
+            continue
+        if state == "start":
+            voiced.extend(pre)
+        voiced.append(frame)
+        if state == "end":
+            break
+        if phrase_time_limit and ep.speech_s + ep.silence_s >= phrase_time_limit:
+            break
+    if raw_out is not None:
+        for _ in range(int(post_roll / ep.frame_s)):
+            next(it)
+    return sr.AudioData(b"".join(voiced), source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+
+
+def endpoint_offline(pcm: np.ndarray, rate: int = SAMPLE_RATE,
+                     max_hangover: float = MAX_HANGOVER) -> Optional[float]:
+    """Run the endpointer over a whole float buffer; returns the end time (s) or None."""
+    vad = FrameVAD(rate=rate)
+    ep = Endpointer(vad, max_hangover=max_hangover)
+    n = len(pcm) // vad.frame_len
+    for i in range(n):
+        if ep.push(pcm[i * vad.frame_len:(i + 1) * vad.frame_len]) == "end":
+            return (i + 1) * ep.frame_s
+    return None
+
+
+# Convenience: quick CLI test
+if __name__ == "__main__":
+    mic = sr.Microphone(sample_rate=SAMPLE_RATE, chunk_size=int(SAMPLE_RATE * FRAME_MS / 1000))
+    print("Say something (Ctrl+C to quit)…")
+    try:
+        with mic as src:
+            while True:
+                t0 = time.perf_counter()
+                audio = record(src, timeout=10, calibration=0.3)
+                secs = len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+                print(f"captured {secs:.2f}s in {time.perf_counter() - t0:.2f}s")
+    except KeyboardInterrupt:
+        print("\nBye!")
@@ -0,0 +1,180 @@
+# whisper_service.py — Whisper transcription in separate worker processes
+#
+# Each worker loads the model once and keeps it. The caller writes 16 kHz int16
+# PCM into a shared-memory block and only the block name goes over the queue,
+# so big buffers are never pickled. Results come back as concurrent Futures,
+# keeping capture, pygame and TTS free of the decode (and of the GIL).
+# Workers take one utterance at a time from the shared queue, so with several
+# workers each new utterance goes to whichever is free. A job whose worker dies,
+# or that isn't done within job_timeout, fails with an error (a hung worker is
+# killed); dead workers are replaced.
+from __future__ import annotations
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from typing import Dict, Optional, Tuple
+
+_STOP = None   # queue sentinel
+RESPAWN_DELAY = 10.0   # seconds between restarts of the same worker slot
+
+
+def _run_job(job, decode) -> Tuple[str, int, Optional[tuple], Optional[str]]:
+    job_id, shm_name, nbytes, language = job
+    try:
+        shm = shared_memory.SharedMemory(name=shm_name)
+        try:
+            pcm = bytes(shm.buf[:nbytes])
+        finally:
+            shm.close()
+        return "done", job_id, decode(pcm, language=language), None
+    except Exception as e:
+        return "done", job_id, None, repr(e)
+
+
+def _worker_main(tasks, results, cpu_threads: int) -> None:
+    import listener_whisper
+    listener_whisper.SERVICE_WORKERS = 0   # decode here, never recurse into a service
+    listener_whisper.CPU_THREADS = cpu_threads
+    listener_whisper.preload()
+
+    while True:
+        job = tasks.get()
+        if job is _STOP:
+            break
+        results.put(("start", job[0], os.getpid(), None))   # lets the service spot a dead owner
+        results.put(_run_job(job, listener_whisper.decode_pcm))
+
+
+class WhisperService:
+    """Pool of transcription processes fed through shared memory."""
+
+    def __init__(self, workers: int = 1, cpu_threads: int = 0, job_timeout: float = 30.0):
+        self._ctx = mp.get_context("spawn")   # don't fork a process that holds pygame/PyAudio
+        self._cpu_threads = cpu_threads
+        self.job_timeout = job_timeout
+        self._tasks = self._ctx.Queue()
+        self._results = self._ctx.Queue()
+        self._spawned_at: Dict[int, float] = {}
+        self._procs = [self._spawn(i) for i in range(max(1, workers))]
+        self._ids = itertools.count()
+        self._pending: Dict[int, Tuple[Future, shared_memory.SharedMemory]] = {}
+        self._deadline: Dict[int, float] = {}
+        self._owner: Dict[int, int] = {}   # job id → pid of the worker decoding it
+        self._lock = threading.Lock()
+        self._closed = False
+        self._collector = threading.Thread(target=self._collect, name="whisper-results", daemon=True)
+        self._collector.start()
+
+    def _spawn(self, i: int):
+        self._spawned_at[i] = time.monotonic()
+        p = self._ctx.Process(target=_worker_main, args=(self._tasks, self._results, self._cpu_threads),
+                              name=f"whisper-worker-{i}", daemon=True)
+        p.start()
+        return p
+
+    def submit(self, pcm: bytes, language: Optional[str] = "en") -> Future:
+        """Queue 16 kHz int16 PCM; the Future resolves to (text, confidence, language) or None."""
+        if self._closed:
+            raise RuntimeError("WhisperService is closed")
+        fut: Future = Future()
+        shm = shared_memory.SharedMemory(create=True, size=max(1, len(pcm)))
+        shm.buf[:len(pcm)] = pcm
+        job_id = next(self._ids)
+        with self._lock:
+            self._pending[job_id] = (fut, shm)
+            self._deadline[job_id] = time.monotonic() + self.job_timeout
+        self._tasks.put((job_id, shm.name, len(pcm), language))
+        return fut
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def _release(self, job_id: int) -> Optional[Future]:
+        with self._lock:
+            entry = self._pending.pop(job_id, None)
+            self._deadline.pop(job_id, None)
+            self._owner.pop(job_id, None)
+        if entry is None:
+            return None
+        fut, shm = entry
+        shm.close()
+        shm.unlink()
+        return fut
+
+    def _fail_all(self, exc: Exception) -> None:
+        with self._lock:
+            ids = list(self._pending)
+        for job_id in ids:
+            fut = self._release(job_id)
+            if fut is not None and not fut.done():
+                fut.set_exception(exc)
+
+    def _fail(self, job_id: int, exc: Exception) -> None:
+        fut = self._release(job_id)
+        if fut is not None and not fut.done():
+            fut.set_exception(exc)
+
+    def _expire(self) -> None:
+        """Fail jobs whose worker died or that ran past their deadline; replace dead workers."""
+        now = time.monotonic()
+        alive = {p.pid for p in self._procs if p.is_alive()}
+        with self._lock:
+            owned = dict(self._owner)
+            late = [j for j, t in self._deadline.items() if t < now]
+        for job_id, pid in owned.items():
+            if pid not in alive:
+                self._fail(job_id, RuntimeError("Whisper worker exited mid-job"))
+        for job_id in late:
+            pid = owned.get(job_id)
+            if pid in alive:   # hung mid-decode: it would hold its slot forever
+                next(p for p in self._procs if p.pid == pid).terminate()
+            self._fail(job_id, TimeoutError(f"Whisper job took over {self.job_timeout:.0f}s"))
+        if not alive and self.pending():
+            self._fail_all(RuntimeError("all Whisper workers exited"))
+        for i, p in enumerate(self._procs):
+            # a worker that keeps dying (e.g. the model won't load) is retried slowly
+            if not p.is_alive() and not self._closed and now - self._spawned_at[i] >= RESPAWN_DELAY:
+                p.join(0)
+                self._procs[i] = self._spawn(i)
+
+    def _collect(self) -> None:
+        checked = time.monotonic()
+        while not self._closed:
+            try:
+                kind, job_id, result, err = self._results.get(timeout=1.0)
+            except queue.Empty:
+                kind = None
+            except (EOFError, OSError):
+                break
+            if kind == "start":
+                with self._lock:
+                    if job_id in self._pending:
+                        self._owner[job_id] = result   # the worker's pid
+            elif kind == "done":
+                fut = self._release(job_id)
+                if fut is not None and not fut.done():
+                    if err:
+                        fut.set_exception(RuntimeError(err))
+                    else:
+                        fut.set_result(result)
+            if time.monotonic() - checked >= 1.0:
+                self._expire()
+                checked = time.monotonic()
+
+    def close(self, timeout: float = 5.0) -> None:
+        if self._closed:
+            return
+        self._closed = True   # stops the collector (and respawning) first
+        for _ in self._procs:
+            self._tasks.put(_STOP)
+        for p in self._procs:
+            p.join(timeout)
+            if p.is_alive():
+                p.terminate()
+        self._fail_all(RuntimeError("WhisperService closed"))